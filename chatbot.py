@@ -1,29 +1,1100 @@
 import customtkinter as ctk
 import json
 import os
+import re
+import hashlib
+import difflib
+import sys
+import argparse
+import asyncio
+import sqlite3
 import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import time
 
+# HTTP/2 through urllib3 is experimental and patches every connection in the
+# process: it offers only "h2" over ALPN, doesn't work through proxies and
+# reads whole response bodies before returning, which defeats streaming. So
+# it is opt-in (CHATBOT_HTTP2=1, needs the h2 package); the default is
+# HTTP/1.1 keep-alive.
+HTTP2_ENABLED = False
+if os.environ.get("CHATBOT_HTTP2") == "1":
+    try:
+        import urllib3.http2
+        import h2  # noqa: F401
+        urllib3.http2.inject_into_urllib3()
+        HTTP2_ENABLED = True
+    except ImportError:
+        print("CHATBOT_HTTP2 is set but the h2 package is missing; using HTTP/1.1")
+
 # --- Configuration ---
+CHAT_DB_FILE = "chat_history.db"
+# Older single-conversation formats, imported once into the database
 CHAT_HISTORY_FILE = "chat_history.json"
-# Using multiple free APIs for better responses
+CHAT_JOURNAL_FILE = "chat_history.jsonl"
+HISTORY_PAGE_SIZE = 50  # Messages read from the database per page
+SEARCH_RESULT_LIMIT = 50
+TRANSCRIPT_WINDOW = 40  # Most message widgets alive at once
+TRANSCRIPT_STEP = 10  # Messages slid into view when a scroll edge is reached
+STREAM_REFRESH_MS = 50  # How often streamed tokens are pushed into the UI
+# Overridable so the streaming path can be pointed at a local stub server
+OPENROUTER_URL = os.environ.get("CHATBOT_OPENROUTER_URL", "https://openrouter.ai/api/v1/chat/completions")
+# Using multiple free APIs for better responses. They are raced against each
+# other; "key_env" providers are only used when that environment variable is set.
 APIS = [
-    {"url": "https://api.deepseek.com/v1/chat/completions", "type": "chat"},
-    {"url": "https://api-inference.huggingface.co/models/mistralai/Mistral-7B-Instruct-v0.2", "type": "hf"},
-    {"url": "https://api-inference.huggingface.co/models/google/flan-t5-large", "type": "hf"},
+    {"name": "DeepSeek", "url": "https://api.deepseek.com/v1/chat/completions", "type": "chat",
+     "model": "deepseek-chat", "key_env": "DEEPSEEK_API_KEY", "timeout": 25},
+    {"name": "Mistral", "url": "https://api-inference.huggingface.co/models/mistralai/Mistral-7B-Instruct-v0.2", "type": "hf",
+     "with_context": True, "timeout": 25,
+     "parameters": {"max_new_tokens": 256, "temperature": 0.7, "top_p": 0.95, "return_full_text": False}},
+    {"name": "FLAN-T5", "url": "https://api-inference.huggingface.co/models/google/flan-t5-large", "type": "hf",
+     "with_context": False, "timeout": 20},
+    {"name": "OpenRouter", "url": OPENROUTER_URL, "type": "chat",
+     "model": "google/gemma-7b-it:free", "headers": {"HTTP-Referer": "http://localhost:3000"}, "timeout": 25},
 ]
+HTTP_POOL_HOSTS = 8  # Hosts whose connection pools are kept around
+HTTP_POOL_PER_HOST = 4  # Connections kept alive (and allowed at once) per host
+HTTP_RETRIES = 2  # Retries for 429/503 answers
+HTTP_BACKOFF = 0.5  # Seconds; doubles after each retry unless Retry-After says otherwise
+RESPONSE_CACHE_FILE = "chat_cache.json"
+BATCH_CACHE_FILE = "chat_batch_cache.json"  # Batch runs keep their answers apart from the GUI's
+RESPONSE_CACHE_SIZE = 500  # Entries kept; least recently used go first
+RESPONSE_CACHE_TTL = 7 * 24 * 3600  # Seconds before a cached answer is considered stale
+CACHE_PROMPT_SIMILARITY = 0.85  # Shingle overlap needed for a near-duplicate question
+CACHE_CONTEXT_SIMILARITY = 0.5  # ...and for the conversation around it
+CACHE_TYPO_SIMILARITY = 0.8  # How close a differing word must be to count as a misspelling
+# Words that flip a question's meaning; normalize_prompt turns "don't" into "don t"
+NEGATIONS = frozenset({"no", "not", "never", "nor", "none", "without", "cannot", "t", "don", "doesn", "didn",
+                       "isn", "aren", "wasn", "weren", "won", "can", "shouldn", "wouldn", "couldn"})
+CONTEXT_TOKEN_BUDGET = 1024  # Estimated tokens of history sent along with each prompt
+CONTEXT_MIN_TURN_TOKENS = 32  # A turn that doesn't fit is cut down, but not below this
+CHARS_PER_TOKEN = 4  # Rough estimate that holds up well enough for English text
+INTENTS_FILE = "chat_intents.json"  # Optional override for DEFAULT_INTENTS
+HEDGE_MIN_DELAY = 0.5  # Shortest head start, also assumed for providers with no history
+HEDGE_MAX_DELAY = 4.0  # Longest head start a provider gets before the next one is fired
+HEDGE_DEADLINE = 30.0  # Give up on all providers after this many seconds
+PROVIDER_LATENCY_DECAY = 0.3  # Weight of the newest sample in the latency average
+
+# --- Chat History Storage ---
+class ConversationStore:
+    """Named conversations and their messages in SQLite, with full-text search.
+
+    Messages are indexed by (conversation, id), so a page of any conversation
+    is a short index range scan however many messages are stored. An FTS5
+    table kept in sync by triggers makes message content searchable.
+    """
+    def __init__(self, path=CHAT_DB_FILE):
+        self.conn = sqlite3.connect(path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")  # WAL keeps this crash-safe
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS conversations (
+                id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL UNIQUE,
+                updated_at TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS messages (
+                id INTEGER PRIMARY KEY,
+                conversation_id INTEGER NOT NULL REFERENCES conversations(id) ON DELETE CASCADE,
+                role TEXT NOT NULL,
+                content TEXT NOT NULL,
+                timestamp TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_messages_conversation ON messages(conversation_id, id);
+            CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+                content, content='messages', content_rowid='id'
+            );
+            CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+                INSERT INTO messages_fts(rowid, content) VALUES (new.id, new.content);
+            END;
+            CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN
+                INSERT INTO messages_fts(messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+            END;
+        """)
+        if not self.list_conversations():
+            self._import_legacy()
+
+    def _import_legacy(self):
+        """Move the old single-conversation history into a "Default" conversation"""
+        conversation_id = self.create_conversation("Default")
+        records = read_legacy_history()
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO messages (conversation_id, role, content, timestamp) VALUES (?, ?, ?, ?)",
+                ((conversation_id, r["role"], r["content"], r.get("timestamp") or datetime.now().isoformat())
+                 for r in records))
+
+    def list_conversations(self):
+        """(id, name) pairs, most recently used first"""
+        rows = self.conn.execute("SELECT id, name FROM conversations ORDER BY updated_at DESC, id DESC")
+        return [(row["id"], row["name"]) for row in rows]
+
+    def create_conversation(self, name):
+        with self.conn:
+            cursor = self.conn.execute("INSERT INTO conversations (name, updated_at) VALUES (?, ?)",
+                                       (name, datetime.now().isoformat()))
+        return cursor.lastrowid
+
+    def page(self, conversation_id, before=None, limit=HISTORY_PAGE_SIZE):
+        """Return up to `limit` messages older than message id `before`, oldest first.
+
+        Returns (records, cursor); pass the cursor back as `before` for the
+        previous page. The cursor is None once the conversation's start is reached.
+        """
+        if before is None:
+            before = sys.maxsize
+        rows = self.conn.execute(
+            "SELECT id, role, content, timestamp FROM messages "
+            "WHERE conversation_id = ? AND id < ? ORDER BY id DESC LIMIT ?",
+            (conversation_id, before, limit + 1)).fetchall()
+        more = len(rows) > limit
+        rows = rows[:limit]
+        records = [{"role": row["role"], "content": row["content"], "timestamp": row["timestamp"]}
+                   for row in reversed(rows)]
+        cursor = rows[-1]["id"] if more else None
+        return records, cursor
+
+    def append(self, conversation_id, record):
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO messages (conversation_id, role, content, timestamp) VALUES (?, ?, ?, ?)",
+                (conversation_id, record["role"], record["content"], record["timestamp"]))
+            self.conn.execute("UPDATE conversations SET updated_at = ? WHERE id = ?",
+                              (record["timestamp"], conversation_id))
+
+    def clear(self, conversation_id):
+        with self.conn:
+            self.conn.execute("DELETE FROM messages WHERE conversation_id = ?", (conversation_id,))
+
+    def search(self, query, limit=SEARCH_RESULT_LIMIT):
+        """Newest messages matching every word of `query` (the last one as a prefix)"""
+        words = query.split()
+        if not words:
+            return []
+        # Quote each word so punctuation in the query can't break FTS syntax
+        match = " ".join('"' + word.replace('"', '""') + '"' for word in words) + "*"
+        rows = self.conn.execute(
+            "SELECT m.conversation_id, c.name, m.role, "
+            "snippet(messages_fts, 0, '', '', '…', 12) AS snippet "
+            "FROM messages_fts JOIN messages m ON m.id = messages_fts.rowid "
+            "JOIN conversations c ON c.id = m.conversation_id "
+            "WHERE messages_fts MATCH ? ORDER BY messages_fts.rowid DESC LIMIT ?",
+            (match, limit))
+        return [dict(row) for row in rows]
 
-def load_chat_history():
-    if os.path.exists(CHAT_HISTORY_FILE):
+    def close(self):
+        self.conn.close()
+
+def read_legacy_history():
+    """Yield messages from the old JSON-lines journal or chat_history.json"""
+    if os.path.exists(CHAT_JOURNAL_FILE):
+        records = []
+        with open(CHAT_JOURNAL_FILE, "rb") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # Torn last line from a crash
+                if "op" in record:
+                    records = []  # A clear marker drops everything before it
+                else:
+                    records.append(record)
+        yield from records
+    elif os.path.exists(CHAT_HISTORY_FILE):
         with open(CHAT_HISTORY_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    return []
+            yield from json.load(f)
+
+# --- HTTP ---
+class HttpPool:
+    """Shared keep-alive session for every outbound call.
+
+    Connections are pooled per host and reused across requests and threads,
+    so only the first call to a provider pays for the TCP and TLS handshake.
+    429 and 503 answers are retried with exponential backoff.
+    """
+    def __init__(self, per_host=HTTP_POOL_PER_HOST, retries=HTTP_RETRIES):
+        # Only answers the server refused are replayed. A POST that timed out
+        # or lost its connection may already be running, so those raise as they are
+        retry = Retry(total=None, connect=0, read=False, other=0, status=retries,
+                      status_forcelist=(429, 503),
+                      allowed_methods=None,  # Includes POST; safe since only refusals are retried
+                      backoff_factor=HTTP_BACKOFF,
+                      respect_retry_after_header=True,
+                      raise_on_status=False)
+        self.adapter = HTTPAdapter(pool_connections=HTTP_POOL_HOSTS,
+                                   pool_maxsize=per_host,
+                                   pool_block=True,
+                                   max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("https://", self.adapter)
+        self.session.mount("http://", self.adapter)
+
+    def resize(self, per_host):
+        """Allow `per_host` connections to each host; drops the connections kept so far"""
+        old = self.adapter.poolmanager
+        self.adapter.init_poolmanager(HTTP_POOL_HOSTS, per_host, block=True)
+        old.clear()
+
+    def post(self, url, **kwargs):
+        return self.session.post(url, **kwargs)
+
+    def stats(self):
+        """Per-host counts of requests sent and connections opened to serve them"""
+        stats = {}
+        pools = self.adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            stats[pool.host] = {
+                "requests": pool.num_requests,
+                "connections": pool.num_connections,
+                "reused": max(0, pool.num_requests - pool.num_connections),
+            }
+        return stats
+
+http_pool = HttpPool()
+
+# --- Response Cache ---
+def normalize_prompt(text):
+    """Lowercase, drop punctuation and collapse whitespace"""
+    return " ".join(re.sub(r"[^\w\s]", " ", text.lower()).split())
+
+def shingles(text, size=3):
+    """Character n-grams of the normalized text, used for fuzzy matching"""
+    text = normalize_prompt(text)
+    if len(text) <= size:
+        return frozenset([text])
+    return frozenset(text[i:i + size] for i in range(len(text) - size + 1))
 
-def save_chat_history(history):
-    with open(CHAT_HISTORY_FILE, "w", encoding="utf-8") as f:
-        json.dump(history, f, indent=4, ensure_ascii=False)
+def jaccard(a, b):
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+def same_words(a, b):
+    """Whether two prompts use the same words, give or take misspellings.
+
+    A word added or dropped, or any difference in a number or a negation,
+    means a different question however similar the rest of the text is.
+    """
+    words_a = set(normalize_prompt(a).split())
+    words_b = set(normalize_prompt(b).split())
+    only_a = words_a - words_b
+    only_b = words_b - words_a
+    if len(only_a) != len(only_b):
+        return False
+    for word in only_a | only_b:
+        if word in NEGATIONS or any(char.isdigit() for char in word):
+            return False
+    return all(any(difflib.SequenceMatcher(None, word, other).ratio() >= CACHE_TYPO_SIMILARITY for other in only_b)
+               for word in only_a)
+
+class ResponseCache:
+    """Local cache of model answers keyed on the prompt and its context window.
+
+    Lookups try the exact normalized key first, then fall back to the most
+    similar cached prompt by shingle overlap (with a looser check on the
+    context) whose words match apart from misspellings. Entries expire after a TTL and the least recently used are
+    evicted past `max_entries`. The cache is saved to disk on `save()`.
+    """
+    def __init__(self, path=RESPONSE_CACHE_FILE, max_entries=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()  # key -> {"prompt", "context", "answer", "created"}
+        self.fingerprints = {}  # key -> (prompt shingles, context shingles)
+        self.lock = threading.Lock()
+        self.dirty = False
+        self.load()
+
+    @staticmethod
+    def key(prompt, context):
+        raw = normalize_prompt(prompt) + "\x00" + normalize_prompt(context)
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def get(self, prompt, context):
+        now = time.time()
+        key = self.key(prompt, context)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or now - entry["created"] > self.ttl:
+                key = self._most_similar(prompt, context, now)
+                if key is None:
+                    return None
+                entry = self.entries[key]
+            self.entries.move_to_end(key)
+            return entry["answer"]
+
+    def _most_similar(self, prompt, context, now):
+        prompt_shingles = shingles(prompt)
+        context_shingles = shingles(context)
+        best_key, best_score = None, CACHE_PROMPT_SIMILARITY
+        for key, entry in self.entries.items():
+            if now - entry["created"] > self.ttl:
+                continue
+            cached_prompt, cached_context = self.fingerprints[key]
+            score = jaccard(prompt_shingles, cached_prompt)
+            if (score >= best_score and jaccard(context_shingles, cached_context) >= CACHE_CONTEXT_SIMILARITY
+                    and same_words(prompt, entry["prompt"])):
+                best_key, best_score = key, score
+        return best_key
+
+    def put(self, prompt, context, answer):
+        with self.lock:
+            self._insert({"prompt": prompt, "context": context, "answer": answer, "created": time.time()})
+            self.dirty = True
+
+    def _insert(self, entry):
+        key = self.key(entry["prompt"], entry["context"])
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        self.fingerprints[key] = (shingles(entry["prompt"]), shingles(entry["context"]))
+        while len(self.entries) > self.max_entries:
+            old_key, _ = self.entries.popitem(last=False)
+            del self.fingerprints[old_key]
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return  # A broken cache is just an empty cache
+        now = time.time()
+        for entry in saved:  # Saved oldest first, so LRU order survives
+            if now - entry["created"] <= self.ttl:
+                self._insert(entry)
+
+    def save(self):
+        with self.lock:
+            if not self.dirty:
+                return
+            entries = list(self.entries.values())
+            self.dirty = False
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entries, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+# --- Streaming ---
+def stream_chat_completion(url, headers, payload, timeout=25):
+    """Yield content tokens from an OpenAI-style /chat/completions endpoint.
+
+    Asks for server-sent events and parses the `data:` lines as they arrive.
+    Servers that ignore `stream` and send one JSON body still work; the whole
+    answer is then yielded as a single token.
+    """
+    payload = dict(payload, stream=True)
+    with http_pool.post(url, headers=headers, json=payload, timeout=timeout, stream=True) as response:
+        response.raise_for_status()
+
+        if "text/event-stream" not in response.headers.get("Content-Type", ""):
+            result = response.json()
+            if result.get("choices"):
+                yield result["choices"][0]["message"]["content"]
+            return
+
+        response.encoding = "utf-8"  # SSE is always UTF-8, whatever the header says
+        # chunk_size=None hands lines over as soon as they arrive
+        for line in response.iter_lines(chunk_size=None, decode_unicode=True):
+            if not line or not line.startswith("data:"):
+                continue  # Keep-alive comments and blank separators
+            data = line[len("data:"):].strip()
+            if data == "[DONE]":
+                break
+            chunk = json.loads(data)
+            if not chunk.get("choices"):
+                continue
+            token = chunk["choices"][0].get("delta", {}).get("content")
+            if token:
+                yield token
+
+class TokenStream:
+    """Thread-safe hand-off of streamed tokens from a worker thread to the Tk loop"""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = []
+
+    def put(self, token):
+        with self.lock:
+            self.pending.append(token)
+
+    def drain(self):
+        """Return everything received since the last drain as one string"""
+        with self.lock:
+            text = "".join(self.pending)
+            self.pending.clear()
+        return text
+
+# --- Context ---
+def estimate_tokens(text):
+    return max(1, -(-len(text) // CHARS_PER_TOKEN))
+
+class ContextWindow:
+    """Conversation context that fits a token budget, newest turns first.
+
+    Each message is rendered and measured once when it is added. Turns that
+    can no longer fit are dropped for good, so the window stays small however
+    long the chat gets. If the oldest turn that still matters doesn't fit, it
+    is truncated rather than dropped when enough budget is left. The assembled
+    text is cached and extended in place while nothing has to be cut.
+    """
+    def __init__(self, budget=CONTEXT_TOKEN_BUDGET):
+        self.budget = budget
+        self.turns = deque()  # (line, tokens), oldest first
+        self.total = 0
+        self.lock = threading.Lock()
+        self.cached = None
+        self.cached_tokens = 0  # Tokens in `cached` when it holds every turn untruncated
+
+    @staticmethod
+    def render(message):
+        role = "User" if message["role"] == "user" else "Assistant"
+        return f"{role}: {message['content']}"
+
+    def reset(self, messages=()):
+        with self.lock:
+            self.turns.clear()
+            self.total = 0
+            self.cached = None
+        for message in messages:
+            self.add(message)
+
+    def add(self, message):
+        """Add the newest message"""
+        line = self.render(message)
+        tokens = estimate_tokens(line)
+        with self.lock:
+            self.turns.append((line, tokens))
+            self.total += tokens
+            dropped = False
+            # The oldest turn is dead once the newer ones alone fill the budget
+            while len(self.turns) > 1 and self.total - self.turns[0][1] >= self.budget:
+                self.total -= self.turns.popleft()[1]
+                dropped = True
+
+            if self.cached is not None and not dropped and self.cached_tokens + tokens <= self.budget:
+                self.cached = f"{self.cached}\n{line}" if self.cached else line
+                self.cached_tokens += tokens
+            else:
+                self.cached = None
+
+    def add_older(self, messages):
+        """Add a page of messages that are older than everything already held"""
+        with self.lock:
+            for message in reversed(messages):
+                if self.total >= self.budget:
+                    break
+                line = self.render(message)
+                tokens = estimate_tokens(line)
+                self.turns.appendleft((line, tokens))
+                self.total += tokens
+            self.cached = None
+
+    def text(self):
+        with self.lock:
+            if self.cached is None:
+                self.cached, complete = self._build()
+                self.cached_tokens = self.total if complete else self.budget + 1
+            return self.cached
+
+    def _build(self):
+        """Returns the context text and whether every turn made it in whole"""
+        parts = []
+        remaining = self.budget
+        for line, tokens in reversed(self.turns):
+            if tokens <= remaining:
+                parts.append(line)
+                remaining -= tokens
+                continue
+            if remaining >= CONTEXT_MIN_TURN_TOKENS:
+                parts.append(line[:remaining * CHARS_PER_TOKEN - 1] + "…")
+            parts.reverse()
+            return "\n".join(parts), False
+        parts.reverse()
+        return "\n".join(parts), True
+
+# --- Intents ---
+# Rule-based answers used when every provider fails, checked top to bottom.
+# Patterns starting with ^ must match at the start of the message. Responses
+# may use {message}, {time} and {date}.
+DEFAULT_INTENTS = [
+    {"name": "greeting",
+     "pattern": r"^(hi|hello|hey|greetings|good morning|good evening)",
+     "response": "Hello! I'm your AI assistant. How can I help you today? Feel free to ask me anything!"},
+    {"name": "capabilities",
+     "pattern": r"(what can you|help me|assist|do for me)",
+     "response": """I'm an AI assistant that can help you with:
+
+• Answering questions on various topics
+• Providing explanations and information
+• Having conversations and discussions
+• Helping with problem-solving
+• Creative writing and brainstorming
+• General knowledge and advice
+
+Just ask me anything you'd like to know!"""},
+    {"name": "time",
+     "pattern": r"(time|date|today|what day)",
+     "response": "Current time: {time}\nDate: {date}"},
+    {"name": "thanks",
+     "pattern": r"(thank|thanks|thx|appreciate)",
+     "response": "You're very welcome! I'm happy to help. Feel free to ask if you need anything else! 😊"},
+    {"name": "goodbye",
+     "pattern": r"(bye|goodbye|see you|later)",
+     "response": "Goodbye! It was nice chatting with you. Come back anytime! 👋"},
+]
+
+class IntentMatcher:
+    """Classifies messages against intent patterns compiled once up front.
+
+    Intents are checked in list order and the first match wins. Messages are
+    lowercased before matching, like the old inline checks.
+    """
+    def __init__(self, intents):
+        self.intents = intents
+        self.patterns = [re.compile(intent["pattern"]) for intent in intents]
+
+    @classmethod
+    def from_file(cls, path=INTENTS_FILE):
+        """Load intents from a JSON list, falling back to the built-in ones"""
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    return cls(json.load(f))
+            except (OSError, ValueError, KeyError, re.error) as e:
+                print(f"Intent config error in {path}: {e}")
+        return cls(DEFAULT_INTENTS)
+
+    def classify(self, message):
+        """Return the first matching intent, or None"""
+        msg_lower = message.lower()
+        for intent, pattern in zip(self.intents, self.patterns):
+            if pattern.search(msg_lower):
+                return intent
+        return None
+
+    def classify_many(self, messages):
+        """Intent names (or None) for each message"""
+        results = []
+        for message in messages:
+            intent = self.classify(message)
+            results.append(intent["name"] if intent else None)
+        return results
+
+    def respond(self, message):
+        intent = self.classify(message)
+        if intent is None:
+            return None
+        now = datetime.now()
+        values = {"message": message, "time": now.strftime("%I:%M %p"), "date": now.strftime("%A, %B %d, %Y")}
+        response = intent["response"]
+        for name, value in values.items():
+            response = response.replace("{" + name + "}", value)
+        return response
+
+def benchmark_intents(count=200_000):
+    """Compare the precompiled matcher with the old inline re.search checks"""
+    samples = [
+        "hello there, how are you?",
+        "what can you do for me",
+        "what day is it today",
+        "thanks a lot!",
+        "ok bye, see you later",
+        "explain quantum entanglement in simple terms please, with an example or two",
+    ]
+    messages = [samples[i % len(samples)] for i in range(count)]
+    matcher = IntentMatcher(DEFAULT_INTENTS)
+
+    def inline(message):
+        msg_lower = message.lower()
+        for intent in DEFAULT_INTENTS:
+            if re.search(intent["pattern"], msg_lower):
+                return intent["name"]
+        return None
+
+    start = time.perf_counter()
+    baseline = [inline(m) for m in messages]
+    baseline_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    matched = matcher.classify_many(messages)
+    matcher_time = time.perf_counter() - start
+
+    assert baseline == matched, "matcher disagrees with inline re.search"
+    print(f"Inline re.search:   {count / baseline_time:,.0f} messages/s")
+    print(f"IntentMatcher:      {count / matcher_time:,.0f} messages/s")
+
+# --- Provider Racing ---
+class ProviderStats:
+    """Running success rate and latency for one provider"""
+    def __init__(self):
+        self.attempts = 0
+        self.successes = 0
+        self.latency = None  # Exponential moving average of successful calls, in seconds
+
+    def record(self, success, elapsed):
+        self.attempts += 1
+        if success:
+            self.successes += 1
+            if self.latency is None:
+                self.latency = elapsed
+            else:
+                self.latency += PROVIDER_LATENCY_DECAY * (elapsed - self.latency)
+
+    def success_rate(self):
+        # Smoothed so one early failure doesn't bury a provider for good
+        return (self.successes + 1) / (self.attempts + 2)
+
+    def expected_latency(self):
+        # Untried providers are assumed fast, so they get raced early and measured
+        return self.latency if self.latency is not None else HEDGE_MIN_DELAY
+
+    def score(self):
+        return self.success_rate() / self.expected_latency()
+
+class HedgedDispatcher:
+    """Races providers with staggered starts and returns the first good answer.
+
+    Providers are tried best-score first. Each one gets a head start equal to
+    its expected latency before the next is fired, and a failure fires the next
+    one straight away. Providers without a measured latency rank as fast and
+    get the shortest head start, so a new provider is raced and timed instead
+    of waiting behind whichever one won first. Once an answer arrives the rest
+    are told to cancel.
+    """
+    def __init__(self, max_workers=16):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="provider")
+        self.stats = {}
+        self.lock = threading.Lock()
+
+    def ranked(self, names):
+        with self.lock:
+            return sorted(names, key=lambda name: self._stats(name).score(), reverse=True)
+
+    def _stats(self, name):
+        if name not in self.stats:
+            self.stats[name] = ProviderStats()
+        return self.stats[name]
+
+    def hedge_delay(self, name):
+        with self.lock:
+            latency = self._stats(name).expected_latency()
+        return min(HEDGE_MAX_DELAY, max(HEDGE_MIN_DELAY, latency))
+
+    def run(self, calls, on_token=None):
+        """Race `calls`, a {name: fn(cancel, emit)} dict, and return the winning text.
+
+        `cancel` is a threading.Event set once the race is decided. `emit`
+        forwards streamed tokens to `on_token`, but only for the first provider
+        that starts streaming so answers never interleave.
+        """
+        cancel = threading.Event()
+        stream_owner = []
+
+        def launch(name):
+            def emit(token):
+                with self.lock:
+                    if not stream_owner:
+                        stream_owner.append(name)
+                if stream_owner[0] == name and on_token is not None and not cancel.is_set():
+                    on_token(token)
+
+            def task():
+                started = time.monotonic()
+                try:
+                    text = calls[name](cancel, emit)
+                except Exception as e:
+                    print(f"{name} Error: {e}")
+                    text = None
+                if not cancel.is_set():  # Losers were cut short, their timing says nothing
+                    with self.lock:
+                        self._stats(name).record(bool(text), time.monotonic() - started)
+                return text
+
+            return self.executor.submit(task)
+
+        waiting = self.ranked(calls)
+        running = {}
+        deadline = time.monotonic() + HEDGE_DEADLINE
+        next_launch = time.monotonic()
+        try:
+            while waiting or running:
+                now = time.monotonic()
+                if now >= deadline:
+                    break
+                if waiting and (now >= next_launch or not running):
+                    name = waiting.pop(0)
+                    running[launch(name)] = name
+                    next_launch = now + self.hedge_delay(name)
+                    continue
+
+                timeout = deadline - now
+                if waiting:
+                    timeout = min(timeout, next_launch - now)
+                done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    del running[future]
+                    text = future.result()
+                    if text:
+                        return text
+                if done:
+                    next_launch = time.monotonic()  # A provider failed, hedge right away
+        finally:
+            cancel.set()
+        return None
+
+# --- Chat Engine ---
+DEFAULT_CONVERSATION = "default"
+
+class ChatEngine:
+    """Headless response logic: context, cache, provider racing and fallbacks.
+
+    Every conversation id gets its own ContextWindow. `reply()` blocks and is
+    meant for worker threads. `respond()` is the asyncio version: it runs
+    `reply()` in the loop's executor, one turn at a time per conversation.
+    A `cache_path` of None turns the response cache off.
+    """
+    def __init__(self, provider_workers=16, cache_path=RESPONSE_CACHE_FILE):
+        self.dispatcher = HedgedDispatcher(max_workers=provider_workers)
+        self.response_cache = ResponseCache(cache_path) if cache_path else None
+        self.intents = IntentMatcher.from_file()
+        self.contexts = {}
+        self.turn_locks = {}
+        self.lock = threading.Lock()
+
+    def context(self, conversation=DEFAULT_CONVERSATION):
+        with self.lock:
+            if conversation not in self.contexts:
+                self.contexts[conversation] = ContextWindow()
+            return self.contexts[conversation]
+
+    def reply(self, message, conversation=DEFAULT_CONVERSATION, on_token=None):
+        """Answer `message` and record both turns in the conversation's context"""
+        context = self.context(conversation)
+        context.add({"role": "user", "content": message})
+        response = self.get_smart_response(message, context.text(), on_token=on_token)
+        context.add({"role": "assistant", "content": response})
+        return response
+
+    async def respond(self, message, conversation=DEFAULT_CONVERSATION, on_token=None):
+        if conversation not in self.turn_locks:
+            self.turn_locks[conversation] = asyncio.Lock()
+        async with self.turn_locks[conversation]:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, self.reply, message, conversation, on_token)
+
+    def get_smart_response(self, message, context, on_token=None):
+        """Race the configured AI services for the best response"""
+        # Repeated questions are answered locally without a round trip
+        if self.response_cache is not None:
+            cached = self.response_cache.get(message, context)
+            if cached:
+                return cached
+        
+        calls = {}
+        for api in APIS:
+            if api.get("key_env") and not os.environ.get(api["key_env"]):
+                continue
+            try_api = self.try_chat_api if api["type"] == "chat" else self.try_huggingface_api
+            calls[api["name"]] = (lambda cancel, emit, api=api, try_api=try_api:
+                                  try_api(api, message, context, cancel, emit))
+
+        response = self.dispatcher.run(calls, on_token=on_token)
+        if response:
+            if self.response_cache is not None:
+                self.response_cache.put(message, context, response)
+            return response
+        
+        # Final fallback - smart rule-based response
+        return self.get_contextual_response(message)
+    
+    def try_huggingface_api(self, api, message, context, cancel, emit):
+        """Try a HuggingFace inference model"""
+        try:
+            prompt = f"{context}\n\nUser: {message}\nAssistant:" if api.get("with_context") else message
+            
+            payload = {"inputs": prompt}
+            if "parameters" in api:
+                payload["parameters"] = api["parameters"]
+            
+            response = http_pool.post(api["url"], json=payload, timeout=api["timeout"])
+            
+            if response.status_code == 200 and not cancel.is_set():
+                result = response.json()
+                if isinstance(result, list) and len(result) > 0:
+                    text = result[0].get("generated_text", "")
+                    # Clean up the response
+                    text = text.replace(prompt, "").strip()
+                    if text and len(text) > 10:
+                        return text
+                    
+        except Exception as e:
+            print(f"{api['name']} Error: {e}")
+        
+        return None
+    
+    def try_chat_api(self, api, message, context, cancel, emit):
+        """Try an OpenAI-style chat model, streaming tokens through `emit`"""
+        try:
+            headers = {"Content-Type": "application/json"}
+            headers.update(api.get("headers", {}))
+            if api.get("key_env"):
+                headers["Authorization"] = f"Bearer {os.environ[api['key_env']]}"
+            
+            messages = [
+                {"role": "system", "content": "You are a helpful AI assistant. Provide clear, concise, and friendly responses."},
+                {"role": "user", "content": message}
+            ]
+            
+            payload = {
+                "model": api["model"],
+                "messages": messages
+            }
+            
+            parts = []
+            for token in stream_chat_completion(api["url"], headers, payload, timeout=api["timeout"]):
+                if cancel.is_set():
+                    return None  # Closing the generator drops the connection
+                parts.append(token)
+                emit(token)
+            return "".join(parts).strip() or None
+                    
+        except Exception as e:
+            print(f"{api['name']} Error: {e}")
+        
+        return None
+    
+    def get_contextual_response(self, message):
+        """Intelligent fallback responses"""
+        response = self.intents.respond(message)
+        if response:
+            return response
+        
+        # Default intelligent response
+        return f"""I understand you're asking about: "{message}"
+
+While I'm having some connectivity issues with my advanced AI models right now, I'm still here to help! Could you please:
+
+1. Rephrase your question
+2. Ask something more specific
+3. Or try asking in a different way
+
+I'll do my best to assist you!"""
+
+    def close(self):
+        if self.response_cache is not None:
+            self.response_cache.save()
+
+async def run_batch(input_path, output_path, concurrency=8, cache_path=BATCH_CACHE_FILE):
+    """Answer every prompt in a JSONL file, up to `concurrency` at a time.
+
+    Input lines look like {"id": ..., "prompt": ..., "conversation": ...};
+    only "prompt" is required. Answers are written to `output_path` as they
+    finish, so the output order follows completion, not input. Answers are
+    cached in `cache_path`, or not at all when it is None.
+    """
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="reply"))
+    # Every prompt in flight may hold a connection to the same provider
+    http_pool.resize(max(concurrency, HTTP_POOL_PER_HOST))
+    engine = ChatEngine(provider_workers=concurrency * len(APIS), cache_path=cache_path)
+    semaphore = asyncio.Semaphore(concurrency)
+    tasks = set()
+    answered = 0
+    started = time.perf_counter()
+
+    with open(input_path, "r", encoding="utf-8") as inp, open(output_path, "w", encoding="utf-8") as out:
+        async def answer(line_number, request):
+            nonlocal answered
+            result = {"id": request.get("id", line_number)}
+            try:
+                result["response"] = await engine.respond(request["prompt"],
+                                                          request.get("conversation", f"batch-{line_number}"))
+            except Exception as e:
+                result["error"] = str(e)
+            finally:
+                semaphore.release()
+            out.write(json.dumps(result, ensure_ascii=False) + "\n")
+            answered += 1
+
+        for line_number, line in enumerate(inp, start=1):
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            await semaphore.acquire()  # Don't read further ahead than we can answer
+            task = asyncio.create_task(answer(line_number, request))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        await asyncio.gather(*tasks)
+
+    engine.close()
+    elapsed = time.perf_counter() - started
+    print(f"Answered {answered} prompts in {elapsed:.1f}s ({answered / elapsed:.2f} prompts/s)")
+    for host, counts in http_pool.stats().items():
+        print(f"  {host}: {counts['requests']} requests over {counts['connections']} connections")
+
+# --- Transcript View ---
+class MessageBubble:
+    """A reusable message widget: bubble frame, header labels and body text"""
+    def __init__(self, master):
+        self.frame = ctk.CTkFrame(master, corner_radius=15)
+
+        header_frame = ctk.CTkFrame(self.frame, fg_color="transparent")
+        header_frame.pack(fill="x", padx=12, pady=(8, 4))
+        self.role_label = ctk.CTkLabel(header_frame, text="", font=ctk.CTkFont(size=12, weight="bold"))
+        self.role_label.pack(side="left")
+        self.time_label = ctk.CTkLabel(header_frame, text="", font=ctk.CTkFont(size=10), text_color="#888")
+        self.time_label.pack(side="right")
+
+        # One label for the whole message; Tk renders the newlines itself
+        self.body_label = ctk.CTkLabel(self.frame, text="", font=ctk.CTkFont(size=13),
+                                       wraplength=500, justify="left", anchor="w")
+        self.body_label.pack(fill="x", padx=12, pady=(0, 8), anchor="w")
+
+    def show(self, message, row):
+        is_user = message["role"] == "user"
+        self.frame.configure(fg_color="#1e3a5f" if is_user else "#2d2d2d")
+        self.role_label.configure(text="You" if is_user else "🤖 AI Assistant",
+                                  text_color="#64b5f6" if is_user else "#81c784")
+        self.time_label.configure(text=format_message_time(message.get("timestamp")))
+        self.body_label.configure(text=message["content"])
+        self.frame.grid(row=row, column=0,
+                        sticky="e" if is_user else "w",
+                        pady=8,
+                        padx=(100 if is_user else 10, 10 if is_user else 100))
+
+    def hide(self):
+        self.frame.grid_remove()
+
+def format_message_time(timestamp):
+    try:
+        return datetime.fromisoformat(timestamp).strftime("%I:%M %p")
+    except (TypeError, ValueError):
+        return ""
+
+class TranscriptView(ctk.CTkScrollableFrame):
+    """Chat transcript that only keeps widgets for a sliding window of messages.
+
+    `messages` is the list of loaded records (oldest first). Bubbles that
+    slide out of the window go back to a pool and are reused for the next
+    messages shown. Scrolling past the oldest loaded message calls
+    `load_older`, which should prepend a page to `messages` and return how
+    many records it added.
+    """
+    def __init__(self, master, messages, load_older=None, **kwargs):
+        super().__init__(master, **kwargs)
+        self.grid_columnconfigure(0, weight=1)
+
+        self.load_older = load_older
+        self.rendered = {}  # message index -> MessageBubble
+        self.pool = []
+        self.typing_frame = None
+        self.check_pending = False
+        self.set_messages(messages)
+
+        # Watch the scroll position to slide the window at either edge
+        self._parent_canvas.configure(yscrollcommand=self._on_yview)
+
+    def set_messages(self, messages):
+        self.messages = messages
+        self.end = len(messages)
+        self.start = max(0, self.end - TRANSCRIPT_WINDOW)
+        self._layout()
+        self.scroll_to_bottom()
+
+    def append(self, message):
+        """Show a newly added message and jump to it"""
+        self.messages.append(message)
+        self.end = len(self.messages)
+        self.start = max(0, self.end - TRANSCRIPT_WINDOW)
+        self._layout()
+        self.scroll_to_bottom()
+
+    def refresh_last(self):
+        """Redraw the newest message after its content changed in place"""
+        bubble = self.rendered.get(len(self.messages) - 1)
+        if bubble is not None:
+            bubble.body_label.configure(text=self.messages[-1]["content"])
+            self.scroll_to_bottom()
+
+    def scroll_to_bottom(self):
+        self.after_idle(lambda: self._parent_canvas.yview_moveto(1.0))
+
+    def show_typing(self):
+        self.typing_frame = ctk.CTkFrame(self, fg_color="#2d2d2d", corner_radius=15)
+        self.typing_frame.grid(row=TRANSCRIPT_WINDOW + 1, column=0, sticky="w", pady=8, padx=(10, 100))
+        ctk.CTkLabel(self.typing_frame,
+                     text="🤖 AI is thinking...",
+                     font=ctk.CTkFont(size=12),
+                     text_color="#81c784").pack(padx=15, pady=10)
+        self.scroll_to_bottom()
+
+    def hide_typing(self):
+        if self.typing_frame is not None:
+            self.typing_frame.destroy()
+            self.typing_frame = None
+
+    def _layout(self):
+        """Recycle bubbles outside [start, end) and (re)grid the ones inside"""
+        for index in [i for i in self.rendered if not self.start <= i < self.end]:
+            bubble = self.rendered.pop(index)
+            bubble.hide()
+            self.pool.append(bubble)
+
+        for index in range(self.start, self.end):
+            bubble = self.rendered.get(index)
+            if bubble is None:
+                bubble = self.pool.pop() if self.pool else MessageBubble(self)
+                self.rendered[index] = bubble
+            bubble.show(self.messages[index], index - self.start)
+
+    def _on_yview(self, first, last):
+        self._scrollbar.set(first, last)
+        if not self.check_pending:
+            self.check_pending = True
+            self.after_idle(self._check_edges)
+
+    def _check_edges(self):
+        self.check_pending = False
+        first, last = self._parent_canvas.yview()
+        # Also true when everything fits, which keeps paging until the view is full
+        if first <= 0.02:
+            if self.start == 0 and self.load_older is not None:
+                added = self.load_older()
+                # Indexes shift by the number of records prepended
+                self.rendered = {i + added: b for i, b in self.rendered.items()}
+                self.start += added
+                self.end += added
+            if self.start > 0:
+                anchor = self.start
+                self.start = max(0, self.start - TRANSCRIPT_STEP)
+                self.end = min(self.end, self.start + TRANSCRIPT_WINDOW)
+                self._layout()
+                self._keep_in_view(anchor)
+        elif last >= 0.98 and self.end < len(self.messages):
+            anchor = self.end - 1
+            self.end = min(len(self.messages), self.end + TRANSCRIPT_STEP)
+            self.start = max(self.start, self.end - TRANSCRIPT_WINDOW)
+            self._layout()
+            self._keep_in_view(anchor)
+
+    def _keep_in_view(self, index):
+        """Scroll so the bubble the user was looking at stays put after a slide"""
+        self.update_idletasks()
+        bubble = self.rendered.get(index)
+        height = self.winfo_height()
+        if bubble is not None and height > 0:
+            self._parent_canvas.yview_moveto(bubble.frame.winfo_y() / height)
 
 # --- Chatbot App ---
 class ChatbotApp(ctk.CTk):
@@ -33,8 +1104,17 @@ class ChatbotApp(ctk.CTk):
         self.title("Local Chatbot Assistant")
         self.geometry("800x600")
         
-        self.chat_history = load_chat_history()
+        self.history_store = ConversationStore()
+        self.conversations = self.history_store.list_conversations()
+        self.conversation_id = self.conversations[0][0]
+        # Only the newest page is loaded up front; older pages load on scroll
+        self.chat_history, self.history_cursor = self.history_store.page(self.conversation_id)
+        self.engine = ChatEngine()
+        self.context = self.engine.context(str(self.conversation_id))
+        self.context.reset(self.chat_history)
         self.is_generating = False
+        self.token_stream = None
+        self.streaming_message = None
 
         # Layout
         self.grid_columnconfigure(0, weight=1)
@@ -48,15 +1128,32 @@ class ChatbotApp(ctk.CTk):
         ctk.CTkLabel(self.header_frame, text="🤖 AI Assistant", 
                     font=ctk.CTkFont(size=24, weight="bold")).grid(row=0, column=0, sticky="w")
         
+        # Conversation picker
+        self.conversation_var = ctk.StringVar(value=self.conversations[0][1])
+        self.conversation_menu = ctk.CTkOptionMenu(self.header_frame, variable=self.conversation_var,
+                                                   values=[name for _, name in self.conversations],
+                                                   command=self.on_conversation_selected, width=160)
+        self.conversation_menu.grid(row=0, column=2, padx=(0, 10))
+        
+        self.new_btn = ctk.CTkButton(self.header_frame, text="New Chat", command=self.new_conversation, width=90)
+        self.new_btn.grid(row=0, column=3, padx=(0, 10))
+        
         # Clear button
         self.clear_btn = ctk.CTkButton(self.header_frame, text="Clear Chat", command=self.clear_chat, 
                                       width=100, fg_color="#d32f2f", hover_color="#b71c1c")
-        self.clear_btn.grid(row=0, column=1, sticky="e")
+        self.clear_btn.grid(row=0, column=4, sticky="e")
 
-        # 2. Chat Display Area (Scrollable)
-        self.chat_frame = ctk.CTkScrollableFrame(self, corner_radius=10)
+        # Search across all conversations
+        self.search_entry = ctk.CTkEntry(self.header_frame, placeholder_text="Search past messages...")
+        self.search_entry.grid(row=1, column=0, columnspan=4, padx=(0, 10), pady=(10, 0), sticky="ew")
+        self.search_entry.bind("<Return>", lambda e: self.search_messages())
+        ctk.CTkButton(self.header_frame, text="Search", command=self.search_messages,
+                      width=100).grid(row=1, column=4, pady=(10, 0), sticky="e")
+
+        # 2. Chat Display Area (Scrollable, only the visible window is rendered)
+        self.chat_frame = TranscriptView(self, self.chat_history, load_older=self.load_older_messages,
+                                         corner_radius=10)
         self.chat_frame.grid(row=1, column=0, padx=20, pady=10, sticky="nsew")
-        self.chat_frame.grid_columnconfigure(0, weight=1)
 
         # 3. Input Area
         self.input_frame = ctk.CTkFrame(self, fg_color="transparent")
@@ -77,69 +1174,90 @@ class ChatbotApp(ctk.CTk):
                                         font=ctk.CTkFont(size=11), text_color="gray")
         self.status_label.grid(row=1, column=0, columnspan=2, sticky="w", pady=(5, 0))
 
-        # Load previous chat history
-        self.load_previous_messages()
+        # Close the database cleanly before exiting
+        self.protocol("WM_DELETE_WINDOW", self.on_closing)
+
+    def on_closing(self):
+        self.history_store.close()
+        self.engine.close()
+        self.destroy()
+
+    def on_conversation_selected(self, name):
+        for conversation_id, conversation_name in self.conversations:
+            if conversation_name == name:
+                self.switch_conversation(conversation_id)
+                return
+
+    def switch_conversation(self, conversation_id):
+        if self.is_generating:
+            # The reply in flight belongs to the current conversation
+            self.status_label.configure(text="Wait for the current reply before switching chats")
+            self.conversation_var.set(self.conversation_name())
+            return
+
+        self.conversation_id = conversation_id
+        self.chat_history, self.history_cursor = self.history_store.page(conversation_id)
+        self.context = self.engine.context(str(conversation_id))
+        self.context.reset(self.chat_history)
+        self.chat_frame.set_messages(self.chat_history)
+        self.conversation_var.set(self.conversation_name())
+        self.status_label.configure(text="Ready")
+
+    def conversation_name(self):
+        return dict(self.conversations)[self.conversation_id]
+
+    def new_conversation(self):
+        names = {name for _, name in self.conversations}
+        number = len(names) + 1
+        while f"Chat {number}" in names:
+            number += 1
+        conversation_id = self.history_store.create_conversation(f"Chat {number}")
+        self.conversations = self.history_store.list_conversations()
+        self.conversation_menu.configure(values=[name for _, name in self.conversations])
+        self.switch_conversation(conversation_id)
+
+    def search_messages(self):
+        query = self.search_entry.get().strip()
+        if not query:
+            return
+        results = self.history_store.search(query)
+
+        popup = ctk.CTkToplevel(self)
+        popup.title(f"Search: {query}")
+        popup.geometry("600x400")
+        results_frame = ctk.CTkScrollableFrame(popup)
+        results_frame.pack(fill="both", expand=True, padx=10, pady=10)
+
+        if not results:
+            ctk.CTkLabel(results_frame, text="No messages found.").pack(pady=10)
+            return
 
-    def load_previous_messages(self):
-        for msg in self.chat_history:
-            self.display_message(msg["role"], msg["content"], save=False)
+        for result in results:
+            role = "You" if result["role"] == "user" else "AI"
+            text = f"{result['name']} · {role}: {result['snippet']}"
+            ctk.CTkButton(results_frame, text=text, anchor="w", fg_color="transparent",
+                          hover_color="#2d2d2d",
+                          command=lambda c=result["conversation_id"]: (popup.destroy(), self.switch_conversation(c))
+                          ).pack(fill="x", pady=2)
+
+    def load_older_messages(self):
+        """Prepend the previous page of history; returns how many were added"""
+        if self.history_cursor is None:
+            return 0
+        older, self.history_cursor = self.history_store.page(self.conversation_id, before=self.history_cursor)
+        self.chat_history[:0] = older
+        self.context.add_older(older)
+        return len(older)
 
     def display_message(self, role, content, save=True):
-        # Create message bubble
-        is_user = role == "user"
-        msg_frame = ctk.CTkFrame(self.chat_frame, 
-                                fg_color="#1e3a5f" if is_user else "#2d2d2d", 
-                                corner_radius=15)
-        msg_frame.grid(row=len(self.chat_frame.winfo_children()), column=0, 
-                      sticky="e" if is_user else "w", 
-                      pady=8, 
-                      padx=(100 if is_user else 10, 10 if is_user else 100))
-        
-        # Header with role and timestamp
-        header_frame = ctk.CTkFrame(msg_frame, fg_color="transparent")
-        header_frame.pack(fill="x", padx=12, pady=(8, 4))
-        
-        role_text = "You" if is_user else "🤖 AI Assistant"
-        role_color = "#64b5f6" if is_user else "#81c784"
-        ctk.CTkLabel(header_frame, text=role_text, 
-                    font=ctk.CTkFont(size=12, weight="bold"), 
-                    text_color=role_color).pack(side="left")
-        
-        time_text = datetime.now().strftime("%I:%M %p")
-        ctk.CTkLabel(header_frame, text=time_text, 
-                    font=ctk.CTkFont(size=10), 
-                    text_color="#888").pack(side="right")
-        
-        # Message content - using CTkLabel for better text display
-        msg_container = ctk.CTkFrame(msg_frame, fg_color="transparent")
-        msg_container.pack(fill="both", expand=True, padx=12, pady=(0, 8))
-        
-        # Split content into lines for better display
-        lines = content.split('\n')
-        for line in lines:
-            if line.strip():  # Only display non-empty lines
-                label = ctk.CTkLabel(msg_container, 
-                                   text=line, 
-                                   font=ctk.CTkFont(size=13),
-                                   wraplength=500,
-                                   justify="left",
-                                   anchor="w")
-                label.pack(fill="x", pady=2, anchor="w")
-            else:
-                # Add spacing for empty lines
-                ctk.CTkFrame(msg_container, height=5, fg_color="transparent").pack()
-        
-        # Auto-scroll to bottom
-        self.chat_frame._parent_canvas.yview_moveto(1.0)
-        self.update()
-        
+        message = {
+            "role": role,
+            "content": content,
+            "timestamp": datetime.now().isoformat()
+        }
+        self.chat_frame.append(message)
         if save:
-            self.chat_history.append({
-                "role": role,
-                "content": content,
-                "timestamp": datetime.now().isoformat()
-            })
-            save_chat_history(self.chat_history)
+            self.history_store.append(self.conversation_id, message)
 
     def on_enter_key(self, event):
         # Send on Enter, newline on Shift+Enter
@@ -160,17 +1278,52 @@ class ChatbotApp(ctk.CTk):
         self.is_generating = True
         self.send_btn.configure(state="disabled", text="...")
         self.status_label.configure(text="Generating response...")
+        self.show_typing_indicator()
         
+        # Tokens arrive on the worker thread and are drawn in batches here
+        self.token_stream = TokenStream()
+        self.streaming_message = None
+        self.after(STREAM_REFRESH_MS, self.flush_stream)
+
         threading.Thread(target=self.get_ai_response, args=(message,), daemon=True).start()
 
+    def flush_stream(self):
+        """Move streamed tokens into the response bubble, at most once per tick"""
+        if self.token_stream is None:
+            return
+        text = self.token_stream.drain()
+        if text:
+            if self.streaming_message is None:
+                self.remove_typing_indicator()
+                self.streaming_message = {
+                    "role": "assistant",
+                    "content": "",
+                    "timestamp": datetime.now().isoformat()
+                }
+                self.chat_frame.append(self.streaming_message)
+            self.streaming_message["content"] += text
+            self.chat_frame.refresh_last()
+        self.after(STREAM_REFRESH_MS, self.flush_stream)
+
+    def finish_response(self, response_text):
+        self.token_stream = None
+        self.remove_typing_indicator()
+        if self.streaming_message is None:
+            self.display_message("assistant", response_text)
+            return
+
+        # The final text wins over whatever was streamed (e.g. after a fallback)
+        self.streaming_message["content"] = response_text
+        self.chat_frame.refresh_last()
+        self.history_store.append(self.conversation_id, self.streaming_message)
+        self.streaming_message = None
+
     def get_ai_response(self, user_message):
         response_text = ""
+        token_stream = self.token_stream
         try:
-            # Show typing indicator
-            self.show_typing_indicator()
-            
             # Try different AI APIs
-            response_text = self.get_smart_response(user_message)
+            response_text = self.engine.reply(user_message, str(self.conversation_id), on_token=token_stream.put)
             
             if not response_text:
                 response_text = "I apologize, but I'm having trouble generating a response right now. Please try asking your question differently."
@@ -178,209 +1331,49 @@ class ChatbotApp(ctk.CTk):
         except Exception as e:
             response_text = f"Sorry, I encountered an error: {str(e)}\n\nPlease try again."
         finally:
-            # Remove typing indicator
-            self.after(0, self.remove_typing_indicator)
-            # Display response
-            self.after(0, lambda: self.display_message("assistant", response_text))
+            # Remove typing indicator and display the final response
+            self.after(0, lambda: self.finish_response(response_text))
             self.after(0, lambda: self.status_label.configure(text="Ready"))
             self.is_generating = False
             self.after(0, lambda: self.send_btn.configure(state="normal", text="Send"))
     
     def show_typing_indicator(self):
         """Show typing animation"""
-        self.typing_frame = ctk.CTkFrame(self.chat_frame, fg_color="#2d2d2d", corner_radius=15)
-        self.typing_frame.grid(row=len(self.chat_frame.winfo_children()), column=0, 
-                              sticky="w", pady=8, padx=(10, 100))
-        
-        typing_label = ctk.CTkLabel(self.typing_frame, 
-                                    text="🤖 AI is thinking...", 
-                                    font=ctk.CTkFont(size=12),
-                                    text_color="#81c784")
-        typing_label.pack(padx=15, pady=10)
-        
-        self.chat_frame._parent_canvas.yview_moveto(1.0)
-        self.update()
+        self.chat_frame.show_typing()
     
     def remove_typing_indicator(self):
         """Remove typing indicator"""
-        if hasattr(self, 'typing_frame'):
-            self.typing_frame.destroy()
-            delattr(self, 'typing_frame')
-    
-    def get_smart_response(self, message):
-        """Try multiple AI services for best response"""
-        # Build conversation context
-        context = self.build_text_context()
-        
-        # Try HuggingFace inference API with better models
-        response = self.try_huggingface_api(message, context)
-        if response:
-            return response
-        
-        # Fallback to OpenRouter (free tier)
-        response = self.try_openrouter(message, context)
-        if response:
-            return response
-        
-        # Final fallback - smart rule-based response
-        return self.get_contextual_response(message)
-    
-    def try_huggingface_api(self, message, context):
-        """Try HuggingFace models"""
-        try:
-            # Use Mistral model for better responses
-            url = "https://api-inference.huggingface.co/models/mistralai/Mistral-7B-Instruct-v0.2"
-            
-            prompt = f"{context}\n\nUser: {message}\nAssistant:"
-            
-            payload = {
-                "inputs": prompt,
-                "parameters": {
-                    "max_new_tokens": 256,
-                    "temperature": 0.7,
-                    "top_p": 0.95,
-                    "return_full_text": False
-                }
-            }
-            
-            response = requests.post(url, json=payload, timeout=25)
-            
-            if response.status_code == 200:
-                result = response.json()
-                if isinstance(result, list) and len(result) > 0:
-                    text = result[0].get("generated_text", "")
-                    # Clean up the response
-                    text = text.replace(prompt, "").strip()
-                    if text and len(text) > 10:
-                        return text
-            
-            # Try FLAN-T5 as backup
-            url2 = "https://api-inference.huggingface.co/models/google/flan-t5-large"
-            payload2 = {"inputs": message}
-            response2 = requests.post(url2, json=payload2, timeout=20)
-            
-            if response2.status_code == 200:
-                result2 = response2.json()
-                if isinstance(result2, list) and len(result2) > 0:
-                    return result2[0].get("generated_text", "").strip()
-                    
-        except Exception as e:
-            print(f"HF API Error: {e}")
-        
-        return None
-    
-    def try_openrouter(self, message, context):
-        """Try OpenRouter free models"""
-        try:
-            url = "https://openrouter.ai/api/v1/chat/completions"
-            headers = {
-                "Content-Type": "application/json",
-                "HTTP-Referer": "http://localhost:3000",
-            }
-            
-            messages = [
-                {"role": "system", "content": "You are a helpful AI assistant. Provide clear, concise, and friendly responses."},
-                {"role": "user", "content": message}
-            ]
-            
-            payload = {
-                "model": "google/gemma-7b-it:free",
-                "messages": messages
-            }
-            
-            response = requests.post(url, headers=headers, json=payload, timeout=25)
-            
-            if response.status_code == 200:
-                result = response.json()
-                if "choices" in result and len(result["choices"]) > 0:
-                    return result["choices"][0]["message"]["content"].strip()
-                    
-        except Exception as e:
-            print(f"OpenRouter Error: {e}")
-        
-        return None
+        self.chat_frame.hide_typing()
     
-    def get_contextual_response(self, message):
-        """Intelligent fallback responses"""
-        import re
-        msg_lower = message.lower()
-        
-        # Greetings
-        if re.search(r'^(hi|hello|hey|greetings|good morning|good evening)', msg_lower):
-            return "Hello! I'm your AI assistant. How can I help you today? Feel free to ask me anything!"
-        
-        # Questions about capabilities
-        if re.search(r'(what can you|help me|assist|do for me)', msg_lower):
-            return """I'm an AI assistant that can help you with:
-
-• Answering questions on various topics
-• Providing explanations and information
-• Having conversations and discussions
-• Helping with problem-solving
-• Creative writing and brainstorming
-• General knowledge and advice
-
-Just ask me anything you'd like to know!"""
-        
-        # Time/Date
-        if re.search(r'(time|date|today|what day)', msg_lower):
-            now = datetime.now()
-            return f"Current time: {now.strftime('%I:%M %p')}\nDate: {now.strftime('%A, %B %d, %Y')}"
-        
-        # Thank you
-        if re.search(r'(thank|thanks|thx|appreciate)', msg_lower):
-            return "You're very welcome! I'm happy to help. Feel free to ask if you need anything else! 😊"
-        
-        # Goodbye
-        if re.search(r'(bye|goodbye|see you|later)', msg_lower):
-            return "Goodbye! It was nice chatting with you. Come back anytime! 👋"
-        
-        # Default intelligent response
-        return f"""I understand you're asking about: "{message}"
-
-While I'm having some connectivity issues with my advanced AI models right now, I'm still here to help! Could you please:
-
-1. Rephrase your question
-2. Ask something more specific
-3. Or try asking in a different way
-
-I'll do my best to assist you!"""
-    
-    def build_text_context(self):
-        """Build simple text context from recent messages"""
-        recent = self.chat_history[-4:] if len(self.chat_history) > 4 else self.chat_history
-        context_parts = []
-        
-        for msg in recent:
-            role = "User" if msg["role"] == "user" else "Assistant"
-            context_parts.append(f"{role}: {msg['content']}")
-        
-        return "\n".join(context_parts) if context_parts else ""
-
-    def build_context(self, max_messages=6):
-        # Get last N messages for context
-        recent = self.chat_history[-max_messages:] if len(self.chat_history) > max_messages else self.chat_history
-        context_parts = []
-        
-        for msg in recent:
-            role = "User" if msg["role"] == "user" else "Assistant"
-            context_parts.append(f"{role}: {msg['content']}")
-        
-        return "\n".join(context_parts)
-
-
-
     def clear_chat(self):
-        # Clear chat display
-        for widget in self.chat_frame.winfo_children():
-            widget.destroy()
-        
-        # Clear history
+        # Clear history and the display
         self.chat_history = []
-        save_chat_history(self.chat_history)
+        self.history_cursor = None
+        self.history_store.clear(self.conversation_id)
+        self.context.reset()
+        self.chat_frame.set_messages(self.chat_history)
         self.status_label.configure(text="Chat cleared")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local Chatbot Assistant")
+    parser.add_argument("--bench-intents", action="store_true", help="Benchmark the fallback intent matcher and exit")
+    parser.add_argument("--batch", metavar="PROMPTS_JSONL", help="Answer prompts from a JSONL file without the GUI")
+    parser.add_argument("--output", metavar="ANSWERS_JSONL", help="Where batch answers go (default: <prompts>.answers.jsonl)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Prompts answered at once in batch mode")
+    parser.add_argument("--cache", default=BATCH_CACHE_FILE, help="Response cache used in batch mode")
+    parser.add_argument("--no-cache", action="store_true", help="Don't cache answers in batch mode")
+    args = parser.parse_args()
+
+    if args.bench_intents:
+        benchmark_intents()
+        sys.exit()
+
+    if args.batch:
+        output = args.output or os.path.splitext(args.batch)[0] + ".answers.jsonl"
+        cache_path = None if args.no_cache else args.cache
+        asyncio.run(run_batch(args.batch, output, concurrency=args.concurrency, cache_path=cache_path))
+        sys.exit()
+
     ctk.set_appearance_mode("dark")
     ctk.set_default_color_theme("blue")
     
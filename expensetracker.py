@@ -1,111 +1,857 @@
 import customtkinter as ctk
 import sqlite3
-from datetime import datetime
-from tkinter import messagebox
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+import threading
+import os
+import re
+import csv
+import hashlib
+import html
+import itertools
+import sys
+import time
+import random
+import argparse
+import tempfile
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from tkinter import filedialog, messagebox
+
+DB_FILE = 'expenses.db'
+DB_CACHE_KIB = 32 * 1024  # SQLite page cache per connection
+DB_STATEMENT_CACHE = 64  # Prepared statements kept by the connection
+HISTORY_LIMIT = 50
+HISTORY_PAGE_SIZE = 200  # Rows fetched per keyset query while scrolling
+HISTORY_ROW_HEIGHT = 34  # Pixels per history row; decides how many row widgets exist
+HISTORY_SCROLL_ROWS = 3  # Rows moved per mouse wheel step
+HISTORY_SORTS = {"date": "e.date", "amount": "e.amount"}
+SEARCH_DELAY_MS = 300  # Wait for typing to pause before filtering
+REPORTS = ["By Category", "Daily", "Monthly", "Budget"]
+TREND_DAYS = 30
+TREND_MONTHS = 12
+CHART_CACHE_SIZE = 8  # Rendered charts kept for instant redisplay
+CHART_BACKGROUND = '#2b2b2b'
+IMPORT_BATCH_ROWS = 5000  # Rows per executemany transaction when importing
+IMPORT_ERROR_SAMPLES = 10  # Rejected rows reported back in detail
+# Which amounts in an import are spending: "negative" for bank accounts,
+# "positive" for most card statements, "auto" for whichever sign most of the
+# file's first batch has. Labels are what the sidebar menu shows.
+IMPORT_SIGNS = {"auto": "Signs: Auto", "negative": "Spending < 0", "positive": "Spending > 0"}
+IMPORT_DATE_FORMATS = ["%Y-%m-%d", "%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S", "%m/%d/%Y", "%d/%m/%Y",
+                       "%m/%d/%y", "%d/%m/%y", "%d.%m.%Y", "%Y/%m/%d", "%Y%m%d%H%M%S", "%Y%m%d"]
+# Header names banks use for each field, compared lowercased
+CSV_COLUMNS = {
+    "date": ["date", "transaction date", "posted date", "posting date", "booking date", "value date"],
+    "amount": ["amount", "transaction amount", "value"],
+    "debit": ["debit", "withdrawal", "withdrawals", "money out", "paid out"],
+    "description": ["description", "memo", "payee", "name", "details", "narrative", "merchant"],
+    "category": ["category"],
+}
+CATEGORIES = ["Food", "Transport", "Bills", "Entertainment", "Shopping", "Other"]
+BENCH_ROWS = 1_000_000
+
+# Schema versions, applied in order and tracked in PRAGMA user_version.
+# Dates are stored as YYYYMMDDHHMMSS integers: they sort correctly and a day
+# or month is a plain integer range.
+MIGRATIONS = [
+    # 1: the original table
+    '''CREATE TABLE IF NOT EXISTS expenses
+       (id INTEGER PRIMARY KEY AUTOINCREMENT,
+        amount REAL,
+        category TEXT,
+        description TEXT,
+        date TEXT);''',
+    # 2: integer dates, categories in a lookup table, indexes for history and reports
+    '''CREATE TABLE categories (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);
+       INSERT OR IGNORE INTO categories (name) SELECT DISTINCT COALESCE(category, 'Other') FROM expenses;
+       CREATE TABLE expenses_v2
+       (id INTEGER PRIMARY KEY AUTOINCREMENT,
+        amount REAL NOT NULL,
+        category_id INTEGER NOT NULL REFERENCES categories(id),
+        description TEXT NOT NULL DEFAULT '',
+        date INTEGER NOT NULL);
+       INSERT INTO expenses_v2 (id, amount, category_id, description, date)
+           SELECT e.id, COALESCE(e.amount, 0), c.id, COALESCE(e.description, ''),
+                  COALESCE(CAST(strftime('%Y%m%d%H%M%S', e.date) AS INTEGER), 0)
+           FROM expenses e JOIN categories c ON c.name = COALESCE(e.category, 'Other');
+       DROP TABLE expenses;
+       ALTER TABLE expenses_v2 RENAME TO expenses;
+       CREATE INDEX idx_expenses_date ON expenses(date);
+       -- amount makes this a covering index for per-category sums
+       CREATE INDEX idx_expenses_category_date ON expenses(category_id, date, amount);''',
+    # 3: keyset paging by amount
+    '''CREATE INDEX idx_expenses_amount ON expenses(amount);''',
+    # 4: per category rollups by day (YYYYMMDD) and month (YYYYMM), kept current
+    # by triggers so reports never scan expenses; monthly budgets per category
+    '''CREATE TABLE daily_totals
+       (category_id INTEGER NOT NULL, day INTEGER NOT NULL, total REAL NOT NULL, count INTEGER NOT NULL,
+        PRIMARY KEY (category_id, day)) WITHOUT ROWID;
+       CREATE INDEX idx_daily_totals_day ON daily_totals(day);
+       CREATE TABLE monthly_totals
+       (category_id INTEGER NOT NULL, month INTEGER NOT NULL, total REAL NOT NULL, count INTEGER NOT NULL,
+        PRIMARY KEY (category_id, month)) WITHOUT ROWID;
+       CREATE INDEX idx_monthly_totals_month ON monthly_totals(month);
+       CREATE TABLE budgets (category_id INTEGER PRIMARY KEY REFERENCES categories(id), monthly_limit REAL NOT NULL);
+       INSERT INTO daily_totals
+           SELECT category_id, date / 1000000, SUM(amount), COUNT(*) FROM expenses GROUP BY category_id, date / 1000000;
+       INSERT INTO monthly_totals
+           SELECT category_id, day / 100, SUM(total), SUM(count) FROM daily_totals GROUP BY category_id, day / 100;
+       CREATE TRIGGER expenses_rollup_insert AFTER INSERT ON expenses BEGIN
+           INSERT INTO daily_totals VALUES (new.category_id, new.date / 1000000, new.amount, 1)
+               ON CONFLICT (category_id, day) DO UPDATE SET total = total + excluded.total, count = count + 1;
+           INSERT INTO monthly_totals VALUES (new.category_id, new.date / 100000000, new.amount, 1)
+               ON CONFLICT (category_id, month) DO UPDATE SET total = total + excluded.total, count = count + 1;
+       END;
+       CREATE TRIGGER expenses_rollup_delete AFTER DELETE ON expenses BEGIN
+           UPDATE daily_totals SET total = total - old.amount, count = count - 1
+               WHERE category_id = old.category_id AND day = old.date / 1000000;
+           DELETE FROM daily_totals WHERE category_id = old.category_id AND day = old.date / 1000000 AND count = 0;
+           UPDATE monthly_totals SET total = total - old.amount, count = count - 1
+               WHERE category_id = old.category_id AND month = old.date / 100000000;
+           DELETE FROM monthly_totals WHERE category_id = old.category_id AND month = old.date / 100000000 AND count = 0;
+       END;
+       CREATE TRIGGER expenses_rollup_update AFTER UPDATE OF amount, category_id, date ON expenses BEGIN
+           UPDATE daily_totals SET total = total - old.amount, count = count - 1
+               WHERE category_id = old.category_id AND day = old.date / 1000000;
+           DELETE FROM daily_totals WHERE category_id = old.category_id AND day = old.date / 1000000 AND count = 0;
+           UPDATE monthly_totals SET total = total - old.amount, count = count - 1
+               WHERE category_id = old.category_id AND month = old.date / 100000000;
+           DELETE FROM monthly_totals WHERE category_id = old.category_id AND month = old.date / 100000000 AND count = 0;
+           INSERT INTO daily_totals VALUES (new.category_id, new.date / 1000000, new.amount, 1)
+               ON CONFLICT (category_id, day) DO UPDATE SET total = total + excluded.total, count = count + 1;
+           INSERT INTO monthly_totals VALUES (new.category_id, new.date / 100000000, new.amount, 1)
+               ON CONFLICT (category_id, month) DO UPDATE SET total = total + excluded.total, count = count + 1;
+       END;''',
+    # 5: imported rows carry a hash of their source record; the unique index
+    # makes re-importing the same statement skip rows that are already there
+    '''ALTER TABLE expenses ADD COLUMN import_hash TEXT;
+       CREATE UNIQUE INDEX idx_expenses_import_hash ON expenses(import_hash) WHERE import_hash IS NOT NULL;''',
+]
+
+def date_to_int(value):
+    return int(value.strftime("%Y%m%d%H%M%S"))
+
+def format_date(value):
+    """YYYY-MM-DD for a stored integer date"""
+    day = value // 1000000
+    return f"{day // 10000:04d}-{day // 100 % 100:02d}-{day % 100:02d}"
 
 # --- Database Setup ---
-def init_db():
-    conn = sqlite3.connect('expenses.db')
-    c = conn.cursor()
-    c.execute('''CREATE TABLE IF NOT EXISTS expenses
-                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                  amount REAL,
-                  category TEXT,
-                  description TEXT,
-                  date TEXT)''')
-    conn.commit()
-    conn.close()
+class ExpenseRepository:
+    """All reads and writes of expenses.db, over one long-lived connection.
 
-# --- Main App Class ---
-class ExpenseTrackerApp(ctk.CTk):
+    The connection is opened once in WAL mode with synchronous=NORMAL, so a
+    commit is a WAL append instead of a full fsync, and readers never wait
+    for writers. The statement cache keeps the prepared queries. The
+    connection may be used from worker threads; a lock serializes access.
+    Pending MIGRATIONS are applied on open, each in its own transaction.
+    """
+    def __init__(self, path=DB_FILE):
+        self.conn = sqlite3.connect(path, check_same_thread=False, cached_statements=DB_STATEMENT_CACHE)
+        self.lock = threading.RLock()
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")  # WAL keeps this crash-safe
+        self.conn.execute(f"PRAGMA cache_size=-{DB_CACHE_KIB}")
+        self.conn.execute("PRAGMA temp_store=MEMORY")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self.migrate()
+        self.category_ids = dict(self.conn.execute("SELECT name, id FROM categories"))
+        self.writes = 0  # Commits made through this repository
+
+    def data_version(self):
+        """A stamp that changes whenever expenses or budgets change, here or from another process"""
+        with self.lock:
+            # PRAGMA data_version only moves for commits made by other connections
+            return self.writes, self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def migrate(self):
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        for number, script in enumerate(MIGRATIONS[version:], start=version + 1):
+            # executescript commits on its own, so the transaction is spelled out
+            self.conn.executescript(f"BEGIN; {script} PRAGMA user_version = {number}; COMMIT;")
+
+    def category_id(self, name):
+        if name not in self.category_ids:
+            with self.lock, self.conn:
+                self.conn.execute("INSERT OR IGNORE INTO categories (name) VALUES (?)", (name,))
+                self.category_ids[name] = self.conn.execute("SELECT id FROM categories WHERE name = ?",
+                                                            (name,)).fetchone()[0]
+        return self.category_ids[name]
+
+    def categories(self):
+        """Every category name: the built-in ones first, then any that imports added"""
+        with self.lock:
+            names = [row[0] for row in self.conn.execute("SELECT name FROM categories ORDER BY name")]
+        return CATEGORIES + [name for name in names if name not in CATEGORIES]
+
+    def add_expense(self, amount, category, description, date=None):
+        date = date_to_int(date or datetime.now())
+        category_id = self.category_id(category)
+        with self.lock, self.conn:
+            cursor = self.conn.execute("INSERT INTO expenses (amount, category_id, description, date) VALUES (?, ?, ?, ?)",
+                                       (amount, category_id, description, date))
+            self.writes += 1
+        return cursor.lastrowid
+
+    def import_expenses(self, rows):
+        """Insert (amount, category, description, date, import_hash) rows in one transaction.
+
+        Rows whose import_hash is already stored are skipped. Returns the
+        number of rows inserted.
+        """
+        params = [(amount, self.category_id(category), description, date, import_hash)
+                  for amount, category, description, date, import_hash in rows]
+        with self.lock, self.conn:
+            cursor = self.conn.executemany("INSERT OR IGNORE INTO expenses (amount, category_id, description, date, "
+                                           "import_hash) VALUES (?, ?, ?, ?, ?)", params)
+            self.writes += 1
+        return cursor.rowcount  # Rows inserted, not counting the rollup trigger writes
+
+    def recent_expenses(self, limit=HISTORY_LIMIT):
+        """Newest expenses first, as (id, amount, category, description, date) rows"""
+        return self.expense_page(limit=limit)[0]
+
+    def expense_page(self, sort="date", descending=True, category=None, search=None, after=None,
+                     limit=HISTORY_PAGE_SIZE):
+        """One page of expenses ordered by (sort column, id), starting after the keyset `after`.
+
+        Returns (rows, cursor); pass the cursor back as `after` for the next
+        page. The cursor is None after the last page. Seeking with the keyset
+        instead of OFFSET keeps every page an index range scan, however deep
+        the user has scrolled.
+        """
+        column = HISTORY_SORTS[sort]
+        order, compare = ("DESC", "<") if descending else ("ASC", ">")
+        conditions, params = [], []
+        if category is not None:
+            conditions.append("e.category_id = ?")
+            params.append(self.category_ids.get(category, -1))
+        if search:
+            escaped = search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            conditions.append("e.description LIKE ? ESCAPE '\\'")
+            params.append(f"%{escaped}%")
+        if after is not None:
+            conditions.append(f"({column}, e.id) {compare} (?, ?)")
+            params.extend(after)
+        where = f"WHERE {' AND '.join(conditions)} " if conditions else ""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT e.id, e.amount, c.name, e.description, e.date "
+                f"FROM expenses e JOIN categories c ON c.id = e.category_id {where}"
+                f"ORDER BY {column} {order}, e.id {order} LIMIT ?", (*params, limit + 1)).fetchall()
+        if len(rows) <= limit:
+            return rows, None
+        rows = rows[:limit]
+        last = rows[-1]
+        return rows, (last[4] if sort == "date" else last[1], last[0])
+
+    def totals_by_category(self):
+        """(category, total amount) pairs, from the monthly rollup"""
+        with self.lock:
+            return self.conn.execute("SELECT c.name, SUM(m.total) FROM monthly_totals m "
+                                     "JOIN categories c ON c.id = m.category_id GROUP BY m.category_id").fetchall()
+
+    def daily_totals(self, days=TREND_DAYS, today=None):
+        """(YYYYMMDD, total) for each of the last `days` days, including days without expenses"""
+        today = today or date.today()
+        day_numbers = [int((today - timedelta(days=offset)).strftime("%Y%m%d")) for offset in range(days - 1, -1, -1)]
+        with self.lock:
+            totals = dict(self.conn.execute("SELECT day, SUM(total) FROM daily_totals WHERE day BETWEEN ? AND ? "
+                                            "GROUP BY day", (day_numbers[0], day_numbers[-1])))
+        return [(day, totals.get(day, 0.0)) for day in day_numbers]
+
+    def monthly_totals(self, months=TREND_MONTHS, today=None):
+        """(YYYYMM, total) for each of the last `months` months, including months without expenses"""
+        today = today or date.today()
+        index = today.year * 12 + today.month - 1
+        month_numbers = [(i // 12) * 100 + i % 12 + 1 for i in range(index - months + 1, index + 1)]
+        with self.lock:
+            totals = dict(self.conn.execute("SELECT month, SUM(total) FROM monthly_totals WHERE month BETWEEN ? AND ? "
+                                            "GROUP BY month", (month_numbers[0], month_numbers[-1])))
+        return [(month, totals.get(month, 0.0)) for month in month_numbers]
+
+    def budget_status(self, today=None):
+        """(category, spent this month, monthly limit) for every category with a budget"""
+        today = today or date.today()
+        with self.lock:
+            return self.conn.execute(
+                "SELECT c.name, COALESCE(m.total, 0), b.monthly_limit FROM budgets b "
+                "JOIN categories c ON c.id = b.category_id "
+                "LEFT JOIN monthly_totals m ON m.category_id = b.category_id AND m.month = ? "
+                "ORDER BY c.name", (today.year * 100 + today.month,)).fetchall()
+
+    def set_budget(self, category, monthly_limit):
+        """Set a category's monthly budget; a limit of 0 or less removes it"""
+        category_id = self.category_id(category)
+        with self.lock, self.conn:
+            if monthly_limit <= 0:
+                self.conn.execute("DELETE FROM budgets WHERE category_id = ?", (category_id,))
+            else:
+                self.conn.execute("INSERT INTO budgets (category_id, monthly_limit) VALUES (?, ?) "
+                                  "ON CONFLICT (category_id) DO UPDATE SET monthly_limit = excluded.monthly_limit",
+                                  (category_id, monthly_limit))
+            self.writes += 1
+
+    def close(self):
+        with self.lock:
+            self.conn.execute("PRAGMA optimize")
+            self.conn.close()
+
+# --- Import ---
+NOT_NUMBER = re.compile(r"[^0-9.\-]")
+OFX_TIME_ZONE = re.compile(r"\[.*\]$")  # e.g. [-5:EST]
+FRACTIONAL_SECONDS = re.compile(r"\.\d+$")
+SLASH_DATE = re.compile(r"(\d{1,2})/(\d{1,2})/\d{2,4}\b")
+OFX_TAG = re.compile(r"<(/?[A-Za-z0-9.]+)>([^<\r\n]*)")
+
+def parse_amount(text):
+    """A bank amount like "-1,234.50", "$12.00" or "(12.00)" as a float"""
+    text = text.strip()
+    negative = text.startswith("(") and text.endswith(")")
+    text = NOT_NUMBER.sub("", text)
+    if not text:
+        raise ValueError("missing amount")
+    value = float(text)
+    return -abs(value) if negative else value
+
+class DateParser:
+    """Parses dates in any of IMPORT_DATE_FORMATS into stored integer dates.
+
+    Whether slash dates are day or month first is settled once per file by
+    `detect`, so 05/02/2024 means the same date on every row. With that
+    settled no two formats accept the same text, so the last format that
+    worked can safely be tried first, and since statements repeat the same
+    few hundred dates, results are memoized.
+    """
     def __init__(self):
-        super().__init__()
+        self.formats = None  # Set by detect
+        self.parsed = {}
 
-        self.title("Personal Expense Tracker")
-        self.geometry("900x600")
+    def detect(self, texts):
+        """Read slash dates day first if a sample only makes sense that way, month first otherwise"""
+        day_first = False
+        for text in texts:
+            match = SLASH_DATE.match(text.strip())
+            if match is None:
+                continue
+            if int(match.group(1)) > 12:
+                day_first = True
+                break
+            if int(match.group(2)) > 12:
+                break
+        dropped = "%m/%d/" if day_first else "%d/%m/"
+        self.formats = [date_format for date_format in IMPORT_DATE_FORMATS if not date_format.startswith(dropped)]
 
-        # Layout configuration
-        self.grid_columnconfigure(1, weight=1)
-        self.grid_rowconfigure(0, weight=1)
+    def parse(self, text):
+        if self.formats is None:
+            self.detect([text])
+        value = self.parsed.get(text)
+        if value is None:
+            value = self.parsed[text] = self.parse_uncached(text)
+        return value
 
-        # Sidebar
-        self.sidebar_frame = ctk.CTkFrame(self, width=200, corner_radius=0)
-        self.sidebar_frame.grid(row=0, column=0, sticky="nsew")
-        self.sidebar_frame.grid_rowconfigure(4, weight=1)
+    def parse_uncached(self, text):
+        text = FRACTIONAL_SECONDS.sub("", OFX_TIME_ZONE.sub("", text.strip()))
+        for index, date_format in enumerate(self.formats):
+            try:
+                value = date_to_int(datetime.strptime(text, date_format))
+            except ValueError:
+                continue
+            if index:
+                self.formats.insert(0, self.formats.pop(index))
+            return value
+        raise ValueError(f"unrecognized date {text!r}")
 
-        self.logo_label = ctk.CTkLabel(self.sidebar_frame, text="Expense Tracker", font=ctk.CTkFont(size=20, weight="bold"))
-        self.logo_label.grid(row=0, column=0, padx=20, pady=(20, 10))
+class CountingLines:
+    """Lines of a binary file decoded as UTF-8, keeping track of how many bytes were read"""
+    def __init__(self, f):
+        self.f = f
+        self.bytes_read = 0
 
-        self.sidebar_button_1 = ctk.CTkButton(self.sidebar_frame, text="Add Expense", command=self.show_add_expense)
-        self.sidebar_button_1.grid(row=1, column=0, padx=20, pady=10)
+    def __iter__(self):
+        for line in self.f:
+            self.bytes_read += len(line)
+            yield line.decode("utf-8-sig", errors="replace")
 
-        self.sidebar_button_2 = ctk.CTkButton(self.sidebar_frame, text="View History", command=self.show_history)
-        self.sidebar_button_2.grid(row=2, column=0, padx=20, pady=10)
+def read_csv_records(lines):
+    """Yield (record number, fields) from a bank CSV export, with fields keyed by CSV_COLUMNS names"""
+    reader = csv.reader(lines)
+    header = [name.strip().lower() for name in next(reader, [])]
+    columns = {}
+    for field, names in CSV_COLUMNS.items():
+        for name in names:
+            if name in header:
+                columns[field] = header.index(name)
+                break
+    if "date" not in columns or not ("amount" in columns or "debit" in columns):
+        raise ValueError("CSV needs a date column and an amount or debit column")
+    for number, row in enumerate(reader, start=2):
+        if not any(cell.strip() for cell in row):
+            continue
+        yield number, {field: row[index] if index < len(row) else "" for field, index in columns.items()}
 
-        self.sidebar_button_3 = ctk.CTkButton(self.sidebar_frame, text="Reports", command=self.show_reports)
-        self.sidebar_button_3.grid(row=3, column=0, padx=20, pady=10)
-        
-        self.appearance_mode_label = ctk.CTkLabel(self.sidebar_frame, text="Appearance Mode:", anchor="w")
-        self.appearance_mode_label.grid(row=5, column=0, padx=20, pady=(10, 0))
-        self.appearance_mode_optionemenu = ctk.CTkOptionMenu(self.sidebar_frame, values=["System", "Dark", "Light"],
-                                                               command=self.change_appearance_mode_event)
-        self.appearance_mode_optionemenu.grid(row=6, column=0, padx=20, pady=(10, 20))
+def read_ofx_records(lines):
+    """Yield (record number, fields) for each <STMTTRN> of an OFX statement (SGML or XML flavour)"""
+    transaction = None
+    number = 0
+    for line in lines:
+        for tag, value in OFX_TAG.findall(line):
+            tag = tag.upper()
+            if tag == "STMTTRN":
+                transaction = {}
+            elif tag == "/STMTTRN" and transaction is not None:
+                number += 1
+                yield number, {"date": transaction.get("DTPOSTED", ""),
+                               "amount": transaction.get("TRNAMT", ""),
+                               "description": transaction.get("NAME") or transaction.get("MEMO", ""),
+                               "id": transaction.get("FITID", "")}
+                transaction = None
+            elif transaction is not None and not tag.startswith("/"):
+                transaction[tag] = html.unescape(value.strip())  # XML flavour escapes &, < and >
 
+class ExpenseImporter:
+    """Streams a bank CSV or OFX export into the repository.
 
-        # Main Content Area
-        self.main_frame = ctk.CTkFrame(self, corner_radius=0, fg_color="transparent")
-        self.main_frame.grid(row=0, column=1, sticky="nsew", padx=20, pady=20)
+    Records are parsed lazily, validated, and inserted IMPORT_BATCH_ROWS at
+    a time, each batch in one transaction. Every row gets an import hash
+    built from its date, amount, description, and either the bank's
+    transaction id (OFX) or how many identical rows came before it in the
+    file (CSV). Importing the same statement twice adds nothing, while
+    genuinely repeated purchases are kept.
 
-        # Initialize Frames
-        self.add_expense_frame = None
-        self.history_frame = None
-        self.reports_frame = None
+    Bank exports list spending as negative amounts next to positive income,
+    while card statements list purchases as positive and payments as
+    negative. `signs` (a key of IMPORT_SIGNS) says which convention a file
+    uses; with "auto" it is the sign most amounts of the first batch have.
+    Amounts of the other sign are skipped. Rows from a debit column are
+    always spending. `on_progress(fraction, inserted)` is called after each batch.
+    """
+    def __init__(self, repository, on_progress=None, signs="auto"):
+        self.repository = repository
+        self.on_progress = on_progress
+        self.signs = signs
 
-        # Handle window closing to prevent "invalid command" errors
-        self.protocol("WM_DELETE_WINDOW", self.on_closing)
+    def import_file(self, path):
+        """Import one file; returns a dict of inserted, duplicates, skipped, invalid and error samples"""
+        result = {"inserted": 0, "duplicates": 0, "skipped": 0, "invalid": 0, "errors": [],
+                  "signs": self.signs}
+        size = os.path.getsize(path) or 1
+        dates = DateParser()
+        seen = {}
+        spending_sign = {"negative": -1, "positive": 1}.get(self.signs)  # None until the first batch
+        with open(path, "rb") as f:
+            lines = CountingLines(f)
+            ofx = path.lower().endswith((".ofx", ".qfx"))
+            records = read_ofx_records(lines) if ofx else read_csv_records(lines)
+            # Settle the date order from the first batch before any date is parsed
+            head = list(itertools.islice(records, IMPORT_BATCH_ROWS))
+            dates.detect(fields.get("date", "") for _, fields in head)
+            records = itertools.chain(head, records)
+            batch = []
+            for number, fields in records:
+                try:
+                    debit = False
+                    if fields.get("amount", "").strip() or "debit" not in fields:
+                        amount = parse_amount(fields.get("amount", ""))
+                    elif fields["debit"].strip():
+                        amount = -abs(parse_amount(fields["debit"]))
+                        debit = True
+                    else:
+                        result["skipped"] += 1  # A credit in a debit/credit export
+                        continue
+                    date = dates.parse(fields["date"])
+                except (ValueError, KeyError) as e:
+                    result["invalid"] += 1
+                    if len(result["errors"]) < IMPORT_ERROR_SAMPLES:
+                        result["errors"].append(f"Record {number}: {e}")
+                    continue
+                description = " ".join(fields.get("description", "").split())
+                category = fields.get("category", "").strip().title() or "Other"
+                key = f"{date}|{amount:.2f}|{description}"
+                if ofx and fields.get("id"):
+                    key += f"|{fields['id']}"
+                else:
+                    seen[key] = seen.get(key, 0) + 1
+                    key += f"|{seen[key]}"
+                batch.append((amount, category, description, date, hashlib.sha1(key.encode("utf-8")).hexdigest(),
+                              debit))
 
-        # Show default
-        self.show_add_expense()
+                if len(batch) >= IMPORT_BATCH_ROWS:
+                    if spending_sign is None:
+                        spending_sign = self.majority_sign(batch)
+                    self.flush(batch, spending_sign, result, lines.bytes_read / size)
+                    batch = []
+            if batch or spending_sign is None:
+                if spending_sign is None:
+                    spending_sign = self.majority_sign(batch)
+                self.flush(batch, spending_sign, result, 1.0)
+        result["spending"] = "negative" if spending_sign < 0 else "positive"
+        return result
 
-    def on_closing(self):
-        self.quit()
-        self.destroy()
+    @staticmethod
+    def majority_sign(batch):
+        """-1 if most signed amounts in the batch are negative, 1 if most are positive"""
+        negative = sum(1 for row in batch if row[0] < 0 and not row[5])
+        positive = sum(1 for row in batch if row[0] > 0 and not row[5])
+        return 1 if positive > negative else -1
 
-    def change_appearance_mode_event(self, new_appearance_mode: str):
-        ctk.set_appearance_mode(new_appearance_mode)
+    def flush(self, batch, spending_sign, result, fraction):
+        rows = []
+        for amount, category, description, date, import_hash, debit in batch:
+            if not debit and amount * spending_sign <= 0:
+                result["skipped"] += 1  # Income, a card payment or a refund
+                continue
+            rows.append((abs(amount), category, description, date, import_hash))
+        inserted = self.repository.import_expenses(rows) if rows else 0
+        result["inserted"] += inserted
+        result["duplicates"] += len(rows) - inserted
+        if self.on_progress is not None:
+            self.on_progress(fraction, result["inserted"])
 
-    def clear_main_frame(self):
-        for widget in self.main_frame.winfo_children():
-            widget.destroy()
+def format_import_result(path, result):
+    how = "detected" if result["signs"] == "auto" else "as chosen"
+    lines = [f"{os.path.basename(path)}: {result['inserted']} imported, {result['duplicates']} already present, "
+             f"{result['skipped']} income/payment rows skipped, {result['invalid']} invalid",
+             f"Spending read as {result['spending']} amounts ({how})"]
+    lines.extend(result["errors"])
+    return "\n".join(lines)
 
-    # --- Add Expense View ---
-    def show_add_expense(self):
-        self.clear_main_frame()
-        
-        title = ctk.CTkLabel(self.main_frame, text="Add New Expense", font=ctk.CTkFont(size=24, weight="bold"))
+# --- History View ---
+class ExpenseRow:
+    """One reusable history row: a frame with date, category, description and amount labels"""
+    def __init__(self, master):
+        self.frame = ctk.CTkFrame(master, height=HISTORY_ROW_HEIGHT - 4)
+        self.date_label = ctk.CTkLabel(self.frame, text="", width=150, anchor="w")
+        self.date_label.pack(side="left", padx=5)
+        self.category_label = ctk.CTkLabel(self.frame, text="", width=100, anchor="w")
+        self.category_label.pack(side="left", padx=5)
+        self.desc_label = ctk.CTkLabel(self.frame, text="", width=150, anchor="w")
+        self.desc_label.pack(side="left", padx=5)
+        self.amount_label = ctk.CTkLabel(self.frame, text="", width=80, anchor="e")
+        self.amount_label.pack(side="right", padx=5)
+        self.widgets = (self.frame, self.date_label, self.category_label, self.desc_label, self.amount_label)
+
+    def show(self, row, position):
+        # row: id, amount, category, description, date
+        self.date_label.configure(text=format_date(row[4]))
+        self.category_label.configure(text=row[2])
+        self.desc_label.configure(text=row[3])
+        self.amount_label.configure(text=f"${row[1]:.2f}")
+        self.frame.grid(row=position, column=0, sticky="ew", pady=2)
+
+    def hide(self):
+        self.frame.grid_remove()
+
+class HistoryView(ctk.CTkFrame):
+    """The whole expense history, scrolled through a fixed set of row widgets.
+
+    Only as many ExpenseRows exist as fit on screen; scrolling changes their
+    text instead of creating widgets. Rows are fetched from the repository a
+    keyset page at a time as the view nears the end of what is loaded.
+    Sorting (click the Date or Amount header), the category filter and the
+    description search all run in SQL.
+    """
+    def __init__(self, master, repository, **kwargs):
+        super().__init__(master, fg_color="transparent", **kwargs)
+        self.repository = repository
+        self.sort = "date"
+        self.descending = True
+        self.search_job = None
+
+        title = ctk.CTkLabel(self, text="Expense History", font=ctk.CTkFont(size=24, weight="bold"))
+        title.pack(pady=20)
+
+        # Filters
+        filter_frame = ctk.CTkFrame(self, fg_color="transparent")
+        filter_frame.pack(fill="x", pady=(0, 5))
+        self.category_var = ctk.StringVar(value="All")
+        self.category_menu = ctk.CTkOptionMenu(filter_frame, values=["All"] + repository.categories(),
+                                               variable=self.category_var, command=lambda _: self.reload(), width=140)
+        self.category_menu.pack(side="left", padx=5)
+        self.search_entry = ctk.CTkEntry(filter_frame, placeholder_text="Search descriptions")
+        self.search_entry.pack(side="left", padx=5, fill="x", expand=True)
+        self.search_entry.bind("<KeyRelease>", self.on_search_changed)
+
+        # Headers; Date and Amount sort the list
+        header_frame = ctk.CTkFrame(self, fg_color="transparent")
+        header_frame.pack(fill="x", pady=5)
+        self.date_header = ctk.CTkButton(header_frame, width=150, anchor="w", font=("Arial", 12, "bold"),
+                                         fg_color="transparent", command=lambda: self.sort_by("date"))
+        self.date_header.pack(side="left", padx=5)
+        ctk.CTkLabel(header_frame, text="Category", width=100, anchor="w", font=("Arial", 12, "bold")).pack(side="left", padx=5)
+        ctk.CTkLabel(header_frame, text="Desc", width=150, anchor="w", font=("Arial", 12, "bold")).pack(side="left", padx=5)
+        self.amount_header = ctk.CTkButton(header_frame, width=80, anchor="e", font=("Arial", 12, "bold"),
+                                           fg_color="transparent", command=lambda: self.sort_by("amount"))
+        self.amount_header.pack(side="right", padx=5)
+
+        # Rows and scrollbar
+        body = ctk.CTkFrame(self)
+        body.pack(fill="both", expand=True)
+        body.grid_columnconfigure(0, weight=1)
+        body.grid_rowconfigure(0, weight=1)
+        self.rows_frame = ctk.CTkFrame(body, fg_color="transparent")
+        self.rows_frame.grid(row=0, column=0, sticky="nsew")
+        self.rows_frame.grid_columnconfigure(0, weight=1)
+        self.rows_frame.grid_propagate(False)
+        self.scrollbar = ctk.CTkScrollbar(body, command=self.on_scrollbar)
+        self.scrollbar.grid(row=0, column=1, sticky="ns")
+        self.empty_label = ctk.CTkLabel(self.rows_frame, text="No expenses found.")
+
+        self.pool = []
+        self.visible = 0
+        self.rows_frame.bind("<Configure>", self.on_resize)
+        self.bind_wheel(self.rows_frame)
+
+        self.reload()
+
+    def bind_wheel(self, widget):
+        widget.bind("<MouseWheel>", lambda e: self.scroll_by(-HISTORY_SCROLL_ROWS if e.delta > 0 else HISTORY_SCROLL_ROWS))
+        widget.bind("<Button-4>", lambda e: self.scroll_by(-HISTORY_SCROLL_ROWS))
+        widget.bind("<Button-5>", lambda e: self.scroll_by(HISTORY_SCROLL_ROWS))
+
+    def refresh(self):
+        # Imports can add categories
+        self.category_menu.configure(values=["All"] + self.repository.categories())
+        self.reload()
+
+    def reload(self):
+        """Start again from the first page with the current sort and filters"""
+        self.rows = []
+        self.cursor = None
+        self.exhausted = False
+        self.offset = 0
+        arrow = " ▼" if self.descending else " ▲"
+        self.date_header.configure(text="Date" + (arrow if self.sort == "date" else ""))
+        self.amount_header.configure(text="Amount" + (arrow if self.sort == "amount" else ""))
+        self.load_more()
+        self.render()
+
+    def load_more(self):
+        if self.exhausted:
+            return
+        category = self.category_var.get()
+        rows, self.cursor = self.repository.expense_page(
+            self.sort, self.descending, None if category == "All" else category,
+            self.search_entry.get().strip(), self.cursor)
+        self.rows.extend(rows)
+        self.exhausted = self.cursor is None
+
+    def sort_by(self, column):
+        if column == self.sort:
+            self.descending = not self.descending
+        else:
+            self.sort, self.descending = column, True
+        self.reload()
+
+    def on_search_changed(self, event=None):
+        if self.search_job is not None:
+            self.after_cancel(self.search_job)
+        self.search_job = self.after(SEARCH_DELAY_MS, self.reload)
+
+    def on_resize(self, event):
+        visible = max(1, event.height // HISTORY_ROW_HEIGHT)
+        if visible != self.visible:
+            self.visible = visible
+            self.render()
+
+    def on_scrollbar(self, action, amount, unit=None):
+        if action == "moveto":
+            self.scroll_to(round(float(amount) * len(self.rows)))
+        else:
+            self.scroll_by(int(amount) * (self.visible if unit == "pages" else HISTORY_SCROLL_ROWS))
+
+    def scroll_by(self, rows):
+        self.scroll_to(self.offset + rows)
+
+    def scroll_to(self, offset):
+        # Fetch ahead so the next screenful is already loaded
+        while not self.exhausted and offset + 2 * self.visible > len(self.rows):
+            self.load_more()
+        self.offset = max(0, min(offset, len(self.rows) - self.visible))
+        self.render()
+
+    def render(self):
+        """Point the row widgets at rows[offset:offset + visible]"""
+        while len(self.pool) < self.visible:
+            row = ExpenseRow(self.rows_frame)
+            for widget in row.widgets:
+                self.bind_wheel(widget)
+            self.pool.append(row)
+        while not self.exhausted and self.offset + 2 * self.visible > len(self.rows):
+            self.load_more()
+
+        for position, row_widget in enumerate(self.pool):
+            index = self.offset + position
+            if position < self.visible and index < len(self.rows):
+                row_widget.show(self.rows[index], position)
+            else:
+                row_widget.hide()
+
+        if self.rows:
+            self.empty_label.grid_remove()
+            total = len(self.rows)
+            self.scrollbar.set(self.offset / total, min(1.0, (self.offset + self.visible) / total))
+        else:
+            self.empty_label.grid(row=0, column=0, pady=10)
+            self.scrollbar.set(0.0, 1.0)
+
+# --- Report Chart ---
+class ReportChart:
+    """One matplotlib figure and Tk canvas, reused for every report.
+
+    matplotlib is imported when the first chart is made, not at startup.
+    When a trend report only changes in bar heights, the bars are updated
+    in place and blitted over the saved axes background instead of redrawing
+    the figure. Rendered pixels are also cached by (report, data, size), so
+    going back to a chart whose data didn't change just copies them back.
+    """
+    def __init__(self, master):
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+
+        self.figure = Figure(figsize=(6, 5), dpi=100)
+        # Dark background for plot to match theme
+        self.figure.patch.set_facecolor(CHART_BACKGROUND)
+        self.ax = self.figure.add_subplot()
+        self.canvas = FigureCanvasTkAgg(self.figure, master=master)
+        self.widget = self.canvas.get_tk_widget()
+        self.layout = None  # (report, bar labels) the axes are currently set up for
+        self.bars = None  # Animated bar artists of a trend report
+        self.background = None  # Figure pixels without the bars
+        self.renders = OrderedDict()  # (report, data, size) -> figure pixels
+        self.shown = None
+        self.stale = None  # (report, data) shown from the cache that the artists don't match yet
+        self.canvas.mpl_connect("draw_event", self.on_draw)
+        self.canvas.mpl_connect("resize_event", self.on_resize)
+
+    def show(self, report, data):
+        key = (report, tuple(data), tuple(self.figure.bbox.size))
+        if key == self.shown:
+            return
+        cached = self.renders.get(key)
+        if cached is not None:
+            # Just the pixels; the artists are rebuilt by the next draw that needs them
+            self.renders.move_to_end(key)
+            self.canvas.restore_region(cached)
+            self.canvas.blit(self.figure.bbox)
+            self.layout = None
+            self.background = None
+            self.stale = (report, data)
+            self.shown = key
+            return
+        self.stale = None
+        full_draw = self.update_artists(report, data)
+        if full_draw or self.background is None:
+            self.canvas.draw()
+        else:
+            # Only bar heights changed: repaint them over the saved background
+            self.canvas.restore_region(self.background)
+            for bar in self.bars:
+                self.ax.draw_artist(bar)
+            self.canvas.blit(self.figure.bbox)
+        self.renders[key] = self.canvas.copy_from_bbox(self.figure.bbox)
+        while len(self.renders) > CHART_CACHE_SIZE:
+            self.renders.popitem(last=False)
+        self.shown = key
+
+    def on_resize(self, event):
+        """A resize redraws the whole figure, so first bring a cached chart's artists up to date"""
+        if self.stale is not None:
+            self.update_artists(*self.stale)
+            self.stale = None
+
+    def on_draw(self, event):
+        """After a full draw (including a resize), save the background and paint the bars onto it"""
+        if self.bars is not None:
+            self.background = self.canvas.copy_from_bbox(self.figure.bbox)
+            for bar in self.bars:
+                self.ax.draw_artist(bar)
+
+    def reset_axes(self, title):
+        self.ax.clear()
+        # clear() keeps what the pie chart set up: equal aspect and no frame
+        self.ax.set_aspect("auto", adjustable="box")
+        self.ax.set_frame_on(True)
+        self.ax.set_facecolor(CHART_BACKGROUND)
+        self.ax.tick_params(colors="white")
+        self.ax.set_title(title, color="white")
+        self.bars = None
+        self.background = None
+
+    def update_artists(self, report, data):
+        """Bring the figure's artists in line with data; returns whether a full redraw is needed"""
+        if report in ("Daily", "Monthly"):
+            if report == "Daily":
+                labels = [f"{day // 100 % 100:02d}-{day % 100:02d}" for day, _ in data]
+            else:
+                labels = [f"{month // 100}-{month % 100:02d}" for month, _ in data]
+            values = [x[1] for x in data]
+            top = max(values) * 1.15 or 1.0
+            limit = self.ax.get_ylim()[1]
+            if self.layout == (report, labels) and self.bars is not None and limit / 2 <= top <= limit:
+                # Same bars and the axis still fits: no need to touch anything else
+                for bar, value in zip(self.bars, values):
+                    bar.set_height(value)
+                return False
+
+            if report == "Daily":
+                self.reset_axes(f"Spending per Day (last {TREND_DAYS} days)")
+            else:
+                self.reset_axes(f"Spending per Month (last {TREND_MONTHS} months)")
+            self.bars = list(self.ax.bar(range(len(data)), values, color="#1F6AA5", animated=True))
+            self.ax.set_ylim(0, top)
+            step = max(1, len(labels) // 10)
+            self.ax.set_xticks(range(0, len(labels), step))
+            self.ax.set_xticklabels(labels[::step], rotation=45, ha="right")
+            self.layout = (report, labels)
+        elif report == "By Category":
+            self.reset_axes("Expenses by Category")
+            categories = [x[0] for x in data]
+            amounts = [x[1] for x in data]
+            self.ax.pie(amounts, labels=categories, autopct='%1.1f%%', startangle=90, textprops=dict(color="white"))
+            self.ax.axis('equal')  # Equal aspect ratio ensures that pie is drawn as a circle.
+            self.layout = (report,)
+        else:
+            self.reset_axes("This Month vs Budget")
+            categories = [x[0] for x in data]
+            spent = [x[1] for x in data]
+            limits = [x[2] for x in data]
+            colors = ["#D32F2F" if s > l else "#2CC985" for s, l in zip(spent, limits)]
+            self.ax.barh(categories, limits, color="#444444", label="Budget")
+            self.ax.barh(categories, spent, color=colors, height=0.5, label="Spent")
+            self.ax.legend(facecolor=CHART_BACKGROUND, labelcolor="white")
+            self.layout = (report,)
+        self.figure.tight_layout()
+        return True
+
+# --- Add Expense View ---
+class AddExpenseView(ctk.CTkFrame):
+    def __init__(self, master, repository, **kwargs):
+        super().__init__(master, fg_color="transparent", **kwargs)
+        self.repository = repository
+
+        title = ctk.CTkLabel(self, text="Add New Expense", font=ctk.CTkFont(size=24, weight="bold"))
         title.pack(pady=20)
 
-        self.amount_entry = ctk.CTkEntry(self.main_frame, placeholder_text="Amount")
+        self.amount_entry = ctk.CTkEntry(self, placeholder_text="Amount")
         self.amount_entry.pack(pady=10, padx=20, fill="x")
 
         self.category_var = ctk.StringVar(value="Food")
-        categories = ["Food", "Transport", "Bills", "Entertainment", "Shopping", "Other"]
-        self.category_menu = ctk.CTkOptionMenu(self.main_frame, values=categories, variable=self.category_var)
+        self.category_menu = ctk.CTkOptionMenu(self, values=CATEGORIES, variable=self.category_var)
         self.category_menu.pack(pady=10, padx=20, fill="x")
 
-        self.desc_entry = ctk.CTkEntry(self.main_frame, placeholder_text="Description")
+        self.desc_entry = ctk.CTkEntry(self, placeholder_text="Description")
         self.desc_entry.pack(pady=10, padx=20, fill="x")
 
-        add_btn = ctk.CTkButton(self.main_frame, text="Save Expense", command=self.add_expense_to_db)
+        add_btn = ctk.CTkButton(self, text="Save Expense", command=self.add_expense_to_db)
         add_btn.pack(pady=20)
 
+    def refresh(self):
+        pass  # The form shows no stored data
+
     def add_expense_to_db(self):
         amount = self.amount_entry.get()
         category = self.category_var.get()
         description = self.desc_entry.get()
-        date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
         if not amount:
             messagebox.showerror("Error", "Please enter an amount")
@@ -117,99 +863,311 @@ class ExpenseTrackerApp(ctk.CTk):
             messagebox.showerror("Error", "Amount must be a number")
             return
 
-        conn = sqlite3.connect('expenses.db')
-        c = conn.cursor()
-        c.execute("INSERT INTO expenses (amount, category, description, date) VALUES (?, ?, ?, ?)",
-                  (amount, category, description, date))
-        conn.commit()
-        conn.close()
+        self.repository.add_expense(amount, category, description)
 
         messagebox.showinfo("Success", "Expense added successfully!")
         self.amount_entry.delete(0, 'end')
         self.desc_entry.delete(0, 'end')
 
-    # --- History View ---
-    def show_history(self):
-        self.clear_main_frame()
-        
-        title = ctk.CTkLabel(self.main_frame, text="Expense History", font=ctk.CTkFont(size=24, weight="bold"))
+# --- Reports View ---
+class ReportsView(ctk.CTkFrame):
+    """Report selector, budget form and the shared ReportChart; data comes from the rollups"""
+    def __init__(self, master, repository, **kwargs):
+        super().__init__(master, fg_color="transparent", **kwargs)
+        self.repository = repository
+        self.report = REPORTS[0]
+        self.chart = None  # Created on first use, which is when matplotlib gets imported
+
+        title = ctk.CTkLabel(self, text="Spending Analysis", font=ctk.CTkFont(size=24, weight="bold"))
         title.pack(pady=20)
 
-        # Scrollable Frame for list
-        scroll_frame = ctk.CTkScrollableFrame(self.main_frame)
-        scroll_frame.pack(fill="both", expand=True)
+        self.selector = ctk.CTkSegmentedButton(self, values=REPORTS, command=self.select_report)
+        self.selector.set(self.report)
+        self.selector.pack(pady=(0, 10))
 
-        conn = sqlite3.connect('expenses.db')
-        c = conn.cursor()
-        c.execute("SELECT * FROM expenses ORDER BY date DESC LIMIT 50")
-        rows = c.fetchall()
-        conn.close()
+        # Only shown with the Budget report
+        self.budget_form = ctk.CTkFrame(self, fg_color="transparent")
+        self.budget_category_var = ctk.StringVar(value=CATEGORIES[0])
+        ctk.CTkOptionMenu(self.budget_form, values=CATEGORIES, variable=self.budget_category_var,
+                          width=140).pack(side="left", padx=5)
+        self.limit_entry = ctk.CTkEntry(self.budget_form, placeholder_text="Monthly limit (0 removes)", width=180)
+        self.limit_entry.pack(side="left", padx=5)
+        ctk.CTkButton(self.budget_form, text="Set Budget", command=self.save_budget, width=100).pack(side="left", padx=5)
+
+        self.message_label = ctk.CTkLabel(self, text="")
 
-        if not rows:
-            ctk.CTkLabel(scroll_frame, text="No expenses found.").pack(pady=10)
+        self.refresh()
+
+    def select_report(self, report):
+        self.report = report
+        self.refresh()
+
+    def refresh(self):
+        if self.report == "Budget":
+            self.budget_form.pack(pady=(0, 10), after=self.selector)
+        else:
+            self.budget_form.pack_forget()
+
+        # All reports read the rollup tables, not the expenses themselves
+        if self.report == "By Category":
+            data = self.repository.totals_by_category()
+        elif self.report == "Daily":
+            data = self.repository.daily_totals()
+        elif self.report == "Monthly":
+            data = self.repository.monthly_totals()
+        else:
+            data = self.repository.budget_status()
+
+        if self.report == "Budget":
+            # Budgets with nothing spent yet still show, e.g. on the first of the month
+            if not data:
+                self.show_message("No budgets set.")
+                return
+        elif not any(row[1] for row in data):
+            self.show_message("No data to display.")
             return
 
-        # Headers
-        header_frame = ctk.CTkFrame(scroll_frame, fg_color="transparent")
-        header_frame.pack(fill="x", pady=5)
-        ctk.CTkLabel(header_frame, text="Date", width=150, anchor="w", font=("Arial", 12, "bold")).pack(side="left", padx=5)
-        ctk.CTkLabel(header_frame, text="Category", width=100, anchor="w", font=("Arial", 12, "bold")).pack(side="left", padx=5)
-        ctk.CTkLabel(header_frame, text="Desc", width=150, anchor="w", font=("Arial", 12, "bold")).pack(side="left", padx=5)
-        ctk.CTkLabel(header_frame, text="Amount", width=80, anchor="e", font=("Arial", 12, "bold")).pack(side="right", padx=5)
-
-        for row in rows:
-            # row: id, amount, category, description, date
-            f = ctk.CTkFrame(scroll_frame)
-            f.pack(fill="x", pady=2)
-            
-            date_str = row[4].split()[0] # Just date
-            ctk.CTkLabel(f, text=date_str, width=150, anchor="w").pack(side="left", padx=5)
-            ctk.CTkLabel(f, text=row[2], width=100, anchor="w").pack(side="left", padx=5)
-            ctk.CTkLabel(f, text=row[3], width=150, anchor="w").pack(side="left", padx=5)
-            ctk.CTkLabel(f, text=f"${row[1]:.2f}", width=80, anchor="e").pack(side="right", padx=5)
-
-    # --- Reports View ---
-    def show_reports(self):
-        self.clear_main_frame()
-        plt.close('all') # Close any previous figures to prevent memory leaks
-        
-        title = ctk.CTkLabel(self.main_frame, text="Spending Analysis", font=ctk.CTkFont(size=24, weight="bold"))
-        title.pack(pady=20)
+        self.message_label.pack_forget()
+        if self.chart is None:
+            self.chart = ReportChart(self)
+        self.chart.widget.pack(fill="both", expand=True)
+        self.chart.show(self.report, data)
 
-        conn = sqlite3.connect('expenses.db')
-        c = conn.cursor()
-        c.execute("SELECT category, SUM(amount) FROM expenses GROUP BY category")
-        data = c.fetchall()
-        conn.close()
+    def show_message(self, text):
+        if self.chart is not None:
+            self.chart.widget.pack_forget()
+        self.message_label.configure(text=text)
+        self.message_label.pack(pady=20)
 
-        if not data:
-            ctk.CTkLabel(self.main_frame, text="No data to display.").pack(pady=20)
+    def save_budget(self):
+        try:
+            monthly_limit = float(self.limit_entry.get())
+        except ValueError:
+            messagebox.showerror("Error", "Limit must be a number")
             return
+        self.repository.set_budget(self.budget_category_var.get(), monthly_limit)
+        self.limit_entry.delete(0, 'end')
+        self.refresh()
 
-        categories = [x[0] for x in data]
-        amounts = [x[1] for x in data]
+# --- View Manager ---
+class ViewManager:
+    """Builds each view on its first visit and keeps it; switching only hides and shows frames.
 
-        # Matplotlib Figure
-        fig, ax = plt.subplots(figsize=(6, 5), dpi=100)
-        # Dark background for plot to match theme
-        fig.patch.set_facecolor('#2b2b2b') 
-        ax.set_facecolor('#2b2b2b')
-        
-        wedges, texts, autotexts = ax.pie(amounts, labels=categories, autopct='%1.1f%%', startangle=90, 
-                                          textprops=dict(color="white"))
+    Views load their data when built. Afterwards a view's `refresh()` only
+    runs when it is shown again and the repository's data version has moved
+    since its last refresh, so an unchanged history keeps its scroll position
+    and filters, and an unchanged report isn't queried again.
+    """
+    def __init__(self, master, repository, factories):
+        self.master = master
+        self.repository = repository
+        self.factories = factories  # name -> callable(master) building the view
+        self.views = {}
+        self.versions = {}  # name -> data version the view last showed
+        self.current = None
+        master.grid_rowconfigure(0, weight=1)
+        master.grid_columnconfigure(0, weight=1)
+
+    def show(self, name):
+        if self.current is not None and self.current != name:
+            self.views[self.current].grid_remove()
+        self.current = name
+        view = self.views.get(name)
+        if view is None:
+            self.versions[name] = self.repository.data_version()
+            view = self.views[name] = self.factories[name](self.master)
+            view.grid(row=0, column=0, sticky="nsew")
+            return
+        view.grid()
+        self.refresh_if_changed()
+
+    def refresh_if_changed(self):
+        """Refresh the visible view if the data changed since it last did"""
+        if self.current is None:
+            return
+        version = self.repository.data_version()
+        if self.versions.get(self.current) != version:
+            self.versions[self.current] = version
+            self.views[self.current].refresh()
+
+# --- Main App Class ---
+class ExpenseTrackerApp(ctk.CTk):
+    def __init__(self, repository):
+        super().__init__()
+        self.repository = repository
+
+        self.title("Personal Expense Tracker")
+        self.geometry("900x600")
+
+        # Layout configuration
+        self.grid_columnconfigure(1, weight=1)
+        self.grid_rowconfigure(0, weight=1)
+
+        # Sidebar
+        self.sidebar_frame = ctk.CTkFrame(self, width=200, corner_radius=0)
+        self.sidebar_frame.grid(row=0, column=0, sticky="nsew")
+        self.sidebar_frame.grid_rowconfigure(7, weight=1)
+
+        self.logo_label = ctk.CTkLabel(self.sidebar_frame, text="Expense Tracker", font=ctk.CTkFont(size=20, weight="bold"))
+        self.logo_label.grid(row=0, column=0, padx=20, pady=(20, 10))
+
+        self.sidebar_button_1 = ctk.CTkButton(self.sidebar_frame, text="Add Expense", command=self.show_add_expense)
+        self.sidebar_button_1.grid(row=1, column=0, padx=20, pady=10)
+
+        self.sidebar_button_2 = ctk.CTkButton(self.sidebar_frame, text="View History", command=self.show_history)
+        self.sidebar_button_2.grid(row=2, column=0, padx=20, pady=10)
+
+        self.sidebar_button_3 = ctk.CTkButton(self.sidebar_frame, text="Reports", command=self.show_reports)
+        self.sidebar_button_3.grid(row=3, column=0, padx=20, pady=10)
+
+        self.import_button = ctk.CTkButton(self.sidebar_frame, text="Import CSV/OFX", command=self.start_import)
+        self.import_button.grid(row=4, column=0, padx=20, pady=10)
+        # Which sign spending has in the files to import
+        self.import_signs_var = ctk.StringVar(value=IMPORT_SIGNS["auto"])
+        self.import_signs_menu = ctk.CTkOptionMenu(self.sidebar_frame, values=list(IMPORT_SIGNS.values()),
+                                                   variable=self.import_signs_var, width=140)
+        self.import_signs_menu.grid(row=5, column=0, padx=20, pady=(0, 10))
+        self.import_progress = ctk.CTkProgressBar(self.sidebar_frame, width=140)
+        self.import_progress.grid(row=6, column=0, padx=20, pady=(0, 10))
+        self.import_progress.grid_remove()
         
-        ax.axis('equal')  # Equal aspect ratio ensures that pie is drawn as a circle.
-        plt.title("Expenses by Category", color="white")
+        self.appearance_mode_label = ctk.CTkLabel(self.sidebar_frame, text="Appearance Mode:", anchor="w")
+        self.appearance_mode_label.grid(row=8, column=0, padx=20, pady=(10, 0))
+        self.appearance_mode_optionemenu = ctk.CTkOptionMenu(self.sidebar_frame, values=["System", "Dark", "Light"],
+                                                               command=self.change_appearance_mode_event)
+        self.appearance_mode_optionemenu.grid(row=9, column=0, padx=20, pady=(10, 20))
+
+
+        # Main Content Area
+        self.main_frame = ctk.CTkFrame(self, corner_radius=0, fg_color="transparent")
+        self.main_frame.grid(row=0, column=1, sticky="nsew", padx=20, pady=20)
 
-        canvas = FigureCanvasTkAgg(fig, master=self.main_frame)
-        canvas.draw()
-        canvas.get_tk_widget().pack(fill="both", expand=True)
+        # Views are built on first use and kept while the app runs
+        self.views = ViewManager(self.main_frame, repository, {
+            "add": lambda master: AddExpenseView(master, repository),
+            "history": lambda master: HistoryView(master, repository),
+            "reports": lambda master: ReportsView(master, repository),
+        })
 
+        # Handle window closing to prevent "invalid command" errors
+        self.protocol("WM_DELETE_WINDOW", self.on_closing)
+
+        # Show default
+        self.show_add_expense()
+
+    def on_closing(self):
+        self.repository.close()
+        self.quit()
+        self.destroy()
+
+    def start_import(self):
+        paths = filedialog.askopenfilenames(filetypes=[("Bank exports", "*.csv *.ofx *.qfx"), ("All Files", "*.*")])
+        if not paths:
+            return
+        signs = next(key for key, label in IMPORT_SIGNS.items() if label == self.import_signs_var.get())
+        self.import_button.configure(state="disabled", text="Importing...")
+        self.import_progress.set(0)
+        self.import_progress.grid()
+        threading.Thread(target=self.import_files, args=(paths, signs), daemon=True).start()
+
+    def import_files(self, paths, signs="auto"):
+        """Runs on a worker thread; widgets are only updated through after()"""
+        reports = []
+        for number, path in enumerate(paths):
+            def on_progress(fraction, inserted, number=number):
+                overall = (number + fraction) / len(paths)
+                self.after(0, lambda: self.import_progress.set(overall))
+            try:
+                result = ExpenseImporter(self.repository, on_progress, signs).import_file(path)
+                reports.append(format_import_result(path, result))
+            except Exception as e:
+                reports.append(f"{os.path.basename(path)}: {e}")
+        self.after(0, self.finish_import, "\n\n".join(reports))
+
+    def finish_import(self, report):
+        self.import_progress.grid_remove()
+        self.import_button.configure(state="normal", text="Import CSV/OFX")
+        self.views.refresh_if_changed()
+        messagebox.showinfo("Import", report)
+
+    def change_appearance_mode_event(self, new_appearance_mode: str):
+        ctk.set_appearance_mode(new_appearance_mode)
+
+    def show_add_expense(self):
+        self.views.show("add")
+
+    def show_history(self):
+        self.views.show("history")
+
+    def show_reports(self):
+        self.views.show("reports")
+
+def benchmark(rows=BENCH_ROWS):
+    """Time history and report queries on the original schema and the migrated one"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.db")
+        conn = sqlite3.connect(path)
+        conn.executescript(MIGRATIONS[0] + " PRAGMA user_version = 1;")
+        start = datetime(2015, 1, 1)
+        rng = random.Random(0)
+        with conn:
+            conn.executemany("INSERT INTO expenses (amount, category, description, date) VALUES (?, ?, ?, ?)",
+                             ((round(rng.uniform(1, 200), 2), rng.choice(CATEGORIES), f"Expense {i}",
+                               (start + timedelta(seconds=rng.randrange(10 * 365 * 86400))).strftime("%Y-%m-%d %H:%M:%S"))
+                              for i in range(rows)))
+
+        def timed(label, query, runs=5):
+            began = time.perf_counter()
+            for _ in range(runs):
+                query()
+            print(f"  {label:<20} {(time.perf_counter() - began) / runs * 1000:8.2f} ms")
+
+        print(f"{rows} rows, original schema:")
+        timed("history (newest 50)", lambda: conn.execute("SELECT * FROM expenses ORDER BY date DESC LIMIT 50").fetchall())
+        timed("totals by category", lambda: conn.execute("SELECT category, SUM(amount) FROM expenses GROUP BY category").fetchall())
+        conn.close()
+
+        began = time.perf_counter()
+        repository = ExpenseRepository(path)
+        print(f"Migration: {time.perf_counter() - began:.2f}s")
+        print("Migrated schema:")
+        timed("history (newest 50)", repository.recent_expenses)
+        timed("totals by category", repository.totals_by_category)
+        timed("daily trend", repository.daily_totals)
+        timed("monthly trend", repository.monthly_totals)
+        timed("add expense", lambda: repository.add_expense(9.99, "Food", "Benchmark"), runs=1000)
+        repository.close()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Personal Expense Tracker")
+    parser.add_argument("--bench", nargs="?", type=int, const=BENCH_ROWS, metavar="ROWS",
+                        help=f"Benchmark history and report queries on a generated database (default {BENCH_ROWS} rows) and exit")
+    parser.add_argument("--import", dest="import_files", nargs="+", metavar="FILE",
+                        help="Import bank CSV/OFX exports into expenses.db and exit")
+    parser.add_argument("--signs", choices=list(IMPORT_SIGNS), default="auto",
+                        help="Which amounts are spending when importing: negative (bank accounts), "
+                             "positive (most card statements) or auto (the sign most rows have)")
+    args = parser.parse_args()
+
+    if args.bench:
+        benchmark(args.bench)
+        sys.exit()
+
+    if args.import_files:
+        repository = ExpenseRepository()
+        for path in args.import_files:
+            started = time.perf_counter()
+            importer = ExpenseImporter(repository, lambda fraction, inserted: print(
+                f"\r  {fraction:6.1%}  {inserted} rows", end="", flush=True), args.signs)
+            result = importer.import_file(path)
+            print(f"\r{' ' * 40}\r{format_import_result(path, result)}")
+            print(f"  took {time.perf_counter() - started:.1f}s")
+        repository.close()
+        sys.exit()
+
     ctk.set_appearance_mode("System")  # Modes: "System" (standard), "Dark", "Light"
     ctk.set_default_color_theme("blue")  # Themes: "blue" (standard), "green", "dark-blue"
     
-    init_db()
-    app = ExpenseTrackerApp()
+    repository = ExpenseRepository()
+    app = ExpenseTrackerApp(repository)
     app.mainloop()
@@ -4,12 +4,902 @@ import pyperclip
 from tkinter import filedialog, messagebox
 import os
 from pypdf import PdfReader
+from pdf_extract import extract_page_range
+import numpy as np
+import re
+import mmap
+import codecs
+import zlib
+import hashlib
+import itertools
+import heapq
+import sys
+import time
+import argparse
+import atexit
+import json
+import queue
 import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from google.api_core import exceptions as google_exceptions
 
 # Configuration
 ctk.set_appearance_mode("System")  # Modes: "System" (standard), "Dark", "Light"
 ctk.set_default_color_theme("blue")  # Themes: "blue" (standard), "green", "dark-blue"
 
+MODEL_NAME = 'gemini-2.5-flash'
+SUMMARY_PROMPT = "Please provide a concise and structured summary of the following text:\n\n{text}"
+CHUNK_PROMPT = ("Summarize this section of a longer document. Keep the key points, names and figures "
+                "so the section summaries can be merged later:\n\n{text}")
+REDUCE_PROMPT = ("These are summaries of consecutive sections of one document. Merge them into a single "
+                 "concise and structured summary:\n\n{text}")
+CHARS_PER_TOKEN = 4  # Rough estimate for English text
+CHUNK_TOKENS = 6000  # Texts up to this size are summarized in one request
+CHUNK_OVERLAP_TOKENS = 200  # Repeated from the end of one chunk at the start of the next
+REDUCE_FAN_IN = 6  # Partial summaries merged per reduce request
+MAX_WORKERS = 4  # Concurrent Gemini requests
+LATENCY_BUCKETS = (0.25, 0.5, 1, 2, 4, 8, 16, 32)  # Histogram upper bounds in seconds
+STREAM_REFRESH_MS = 33  # How often streamed text is moved into the summary box (~30 fps)
+CHUNK_BOUNDARY_DIVISOR = 8  # Past half size, about 1 in N paragraphs ends a chunk
+SUMMARY_CACHE_DIR = "summary_cache"
+SUMMARY_MODES = ["Gemini", "Offline", "Hybrid"]  # Hybrid condenses offline, then asks Gemini
+OFFLINE_SUMMARY_RATIO = 0.1  # Share of sentences kept by the offline summarizer
+OFFLINE_MIN_SENTENCES = 3
+OFFLINE_MAX_SENTENCES = 40
+OFFLINE_MAX_SENTENCE_CHARS = 400  # Longer "sentences" (run-on lines) are cut at word breaks
+TEXTRANK_BLOCK = 500  # Sentences ranked together; keeps the similarity matrix small
+TEXTRANK_DAMPING = 0.85
+TEXTRANK_ITERATIONS = 50
+STOPWORDS = frozenset("""a an and are as at be but by for from has have he her his i in is it its of on or
+our she so that the their them they this to was we were what when which who will with you your not
+been being can could did do does had if into more most no than then there these those would also""".split())
+BATCH_CONCURRENCY = 4  # Files summarized at once in batch mode
+BATCH_REQUESTS_PER_MINUTE = 60  # Stay below the Gemini quota
+BATCH_RETRY_BUDGET = 20  # Retries shared by all requests of one batch run
+BATCH_BACKOFF = 2.0  # Seconds before the first retry, doubled after each attempt
+BATCH_EXTENSIONS = (".txt", ".pdf")
+RETRYABLE_ERRORS = (google_exceptions.ResourceExhausted, google_exceptions.TooManyRequests,
+                    google_exceptions.ServiceUnavailable, google_exceptions.InternalServerError,
+                    google_exceptions.DeadlineExceeded)
+LARGE_FILE_BYTES = 2 * 1024 * 1024  # Bigger .txt files are memory-mapped and previewed page by page
+PREVIEW_PAGE_BYTES = 64 * 1024  # Text shown per preview page
+READ_BLOCK_BYTES = 1024 * 1024  # Bytes decoded at a time when feeding the summarizer
+PDF_PAGES_PER_TASK = 8  # Pages each extraction process handles per task
+# Starting the worker processes takes about 2s (each re-imports this script),
+# as long as ~30 pages take to read serially, so smaller PDFs don't start them.
+# Once they're running, any PDF longer than one task uses them.
+PDF_PARALLEL_MIN_PAGES = 48
+
+# --- PDF Extraction ---
+class PdfWorkers:
+    """The PDF extraction process pool, started on first use and shared by every PDF.
+
+    Workers are spawned, not forked: the pool is started from a worker thread
+    of a process that may already have Tk and gRPC threads, and forking those
+    can deadlock. A spawned worker re-runs this script's imports once when it
+    starts; the task itself lives in pdf_extract so unpickling it doesn't
+    import everything a second time. Workers are kept around so later PDFs
+    (and every PDF of a batch run) don't pay for starting them again.
+    """
+    def __init__(self):
+        self.executor = None
+        self.lock = threading.Lock()
+
+    def started(self):
+        return self.executor is not None
+
+    def pool(self):
+        with self.lock:
+            if self.executor is None:
+                self.executor = ProcessPoolExecutor(mp_context=multiprocessing.get_context("spawn"))
+                atexit.register(self.shutdown)
+            return self.executor
+
+    def shutdown(self):
+        with self.lock:
+            if self.executor is not None:
+                self.executor.shutdown(wait=True, cancel_futures=True)
+                self.executor = None
+
+pdf_workers = PdfWorkers()
+
+def iter_pdf_pages(file_path, pages_per_task=PDF_PAGES_PER_TASK):
+    """Yield the text of each page in order, extracting pages in parallel.
+
+    Page ranges are spread over a process pool (pypdf is pure Python, so
+    threads wouldn't help), and pages are yielded as soon as their range is
+    done, while later ranges are still being parsed.
+    """
+    reader = PdfReader(file_path)
+    page_count = len(reader.pages)
+    if page_count <= pages_per_task or (page_count < PDF_PARALLEL_MIN_PAGES and not pdf_workers.started()):
+        for page in reader.pages:
+            yield (page.extract_text() or "") + "\n"
+        return
+
+    pool = pdf_workers.pool()
+    futures = [pool.submit(extract_page_range, file_path, start, min(start + pages_per_task, page_count))
+               for start in range(0, page_count, pages_per_task)]
+    try:
+        for future in futures:
+            yield from future.result()
+    finally:
+        # Stop early if the consumer goes away (e.g. the file was cleared)
+        for future in futures:
+            future.cancel()
+
+class PageFeed:
+    """Pages of a loaded document that can be read while extraction is still running"""
+    def __init__(self):
+        self.pages = []
+        self.done = False
+        self.error = None
+        self.condition = threading.Condition()
+
+    def add(self, text):
+        with self.condition:
+            self.pages.append(text)
+            self.condition.notify_all()
+
+    def finish(self, error=None):
+        with self.condition:
+            self.done = True
+            self.error = error
+            self.condition.notify_all()
+
+    def __iter__(self):
+        """Yield every page, waiting for ones that haven't been extracted yet"""
+        index = 0
+        while True:
+            with self.condition:
+                while index >= len(self.pages) and not self.done:
+                    self.condition.wait()
+                if index >= len(self.pages):
+                    if self.error is not None:
+                        raise self.error
+                    return
+                page = self.pages[index]
+            index += 1
+            yield page
+
+def benchmark_pdf(file_path):
+    """Compare serial extraction with the page-parallel generator"""
+    start = time.perf_counter()
+    text = ""
+    for page in PdfReader(file_path).pages:
+        text += page.extract_text() + "\n"
+    serial_time = time.perf_counter() - start
+
+    print(f"Serial:   {serial_time:.2f}s total")
+    # A first run big enough for the worker processes includes starting them
+    for label in ("Generator, 1st run", "Generator, 2nd run"):
+        start = time.perf_counter()
+        first_page_time = None
+        pages = 0
+        for _ in iter_pdf_pages(file_path):
+            if first_page_time is None:
+                first_page_time = time.perf_counter() - start
+            pages += 1
+        parallel_time = time.perf_counter() - start
+        mode = "parallel" if pdf_workers.started() else "serial"
+        print(f"{label} ({mode}): {parallel_time:.2f}s total for {pages} pages, "
+              f"first page after {first_page_time:.2f}s")
+
+# --- Gemini Client ---
+class LatencyHistogram:
+    """Counts of request latencies in LATENCY_BUCKETS; safe to record from any thread"""
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # The last bucket holds everything slower
+        self.total = 0.0
+        self.lock = threading.Lock()
+
+    def record(self, seconds):
+        index = next((i for i, bound in enumerate(self.bounds) if seconds <= bound), len(self.bounds))
+        with self.lock:
+            self.counts[index] += 1
+            self.total += seconds
+
+    def count(self):
+        return sum(self.counts)
+
+    def percentile(self, fraction):
+        """Upper bound of the bucket holding the given fraction of requests (inf if past the last)"""
+        with self.lock:
+            counts = list(self.counts)
+        target = fraction * sum(counts)
+        seen = 0
+        for bound, count in zip(self.bounds + (float("inf"),), counts):
+            seen += count
+            if count and seen >= target:
+                return bound
+        return 0.0
+
+    def format(self):
+        count = self.count()
+        if not count:
+            return "  no requests"
+        lines = [f"  {count} requests, mean {self.total / count:.2f}s, "
+                 f"p50 <= {self.percentile(0.5)}s, p95 <= {self.percentile(0.95)}s"]
+        labels = [f"<= {bound}s" for bound in self.bounds] + [f"> {self.bounds[-1]}s"]
+        for label, bucket in zip(labels, self.counts):
+            if bucket:
+                lines.append(f"  {label:>8} {bucket:6d} {'#' * max(1, round(40 * bucket / count))}")
+        return "\n".join(lines)
+
+class TimedModel:
+    """A Gemini model that records how long each request takes"""
+    def __init__(self, model, clients):
+        self.model = model
+        self.clients = clients
+
+    def generate_content(self, prompt, **kwargs):
+        start = time.perf_counter()
+        response = self.model.generate_content(prompt, **kwargs)
+        if not kwargs.get("stream"):
+            self.clients.latency["request"].record(time.perf_counter() - start)
+            return response
+        return self.timed_stream(response, start)
+
+    def timed_stream(self, response, start):
+        first = True
+        for chunk in response:
+            if first:
+                self.clients.latency["first_token"].record(time.perf_counter() - start)
+                first = False
+            yield chunk
+        self.clients.latency["request"].record(time.perf_counter() - start)
+
+class GeminiClients:
+    """Gemini models shared for the life of the process.
+
+    `genai.configure` sets up a process-wide client, so it only runs when the
+    API key changes; model handles are kept and reused (with their gRPC
+    connection) until then. Latency of every request goes into `latency`.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.api_key = None
+        self.models = {}
+        self.latency = {"request": LatencyHistogram(), "first_token": LatencyHistogram()}
+
+    def model(self, api_key, model_name=MODEL_NAME):
+        with self.lock:
+            if api_key != self.api_key:
+                genai.configure(api_key=api_key)
+                self.api_key = api_key
+                self.models.clear()  # Handles made for the old key would keep using it
+            if model_name not in self.models:
+                self.models[model_name] = TimedModel(genai.GenerativeModel(model_name), self)
+            return self.models[model_name]
+
+    def report(self):
+        return (f"Request latency:\n{self.latency['request'].format()}\n"
+                f"Time to first streamed token:\n{self.latency['first_token'].format()}")
+
+gemini_clients = GeminiClients()
+
+# --- Large Text Files ---
+class MappedText:
+    """A UTF-8 text file read through mmap instead of being loaded into memory.
+
+    Iterating yields the text in blocks of READ_BLOCK_BYTES, decoded
+    incrementally so characters split across blocks come out whole; this is
+    what the summarizers consume. `page` decodes one preview page on demand.
+    """
+    def __init__(self, file_path):
+        self.file_path = file_path
+        with open(file_path, "rb") as f:
+            # The mapping stays valid after the file is closed; it is
+            # released when this object is garbage collected
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.size = len(self.buffer)
+        self.page_count = max(1, -(-self.size // PREVIEW_PAGE_BYTES))
+
+    def __iter__(self):
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        for start in range(0, self.size, READ_BLOCK_BYTES):
+            text = decoder.decode(self.buffer[start:start + READ_BLOCK_BYTES])
+            if text:
+                yield text
+        text = decoder.decode(b"", final=True)
+        if text:
+            yield text
+
+    def char_start(self, offset):
+        """Move offset forward past UTF-8 continuation bytes to the start of a character"""
+        while offset < self.size and self.buffer[offset] & 0xC0 == 0x80:
+            offset += 1
+        return offset
+
+    def page(self, index):
+        start = self.char_start(index * PREVIEW_PAGE_BYTES)
+        stop = self.char_start((index + 1) * PREVIEW_PAGE_BYTES)
+        return self.buffer[start:stop].decode("utf-8", errors="replace")
+
+# --- Chunked Summarization ---
+def iter_paragraphs(pieces, max_chars=None):
+    """Yield paragraphs from an iterable of text pieces, joining across piece boundaries.
+
+    Text without blank lines (logs, lists, hard-wrapped text) would otherwise
+    pile up as one paragraph. With `max_chars`, longer runs are cut at their
+    last line break within that size, or hard where there is none.
+    """
+    buffer = ""
+    for piece in pieces:
+        buffer += piece
+        parts = re.split(r"\n\s*\n", buffer)
+        buffer = parts.pop()  # May continue in the next piece
+        for part in parts:
+            if max_chars is not None:
+                heads, part = cut_at_lines(part, max_chars)
+                yield from (head.strip() for head in heads if head.strip())
+            if part.strip():
+                yield part.strip()
+        if max_chars is not None:
+            heads, buffer = cut_at_lines(buffer, max_chars)
+            yield from (head.strip() for head in heads if head.strip())
+    if buffer.strip():
+        yield buffer.strip()
+
+def cut_at_lines(text, limit):
+    """Cut text into pieces of at most `limit` characters at line breaks, or hard where there are none.
+
+    Returns (pieces, rest); the rest is at most `limit` characters long.
+    """
+    pieces = []
+    start = 0
+    while len(text) - start > limit:
+        cut = text.rfind("\n", start, start + limit)
+        if cut <= start:
+            cut = start + limit
+        pieces.append(text[start:cut])
+        start = cut
+    return pieces, text[start:]
+
+def split_long_paragraph(paragraph, limit):
+    """Break a paragraph longer than `limit` characters at sentence ends, or hard if needed"""
+    if len(paragraph) <= limit:
+        yield paragraph
+        return
+    current = ""
+    for sentence in re.split(r"(?<=[.!?])\s+", paragraph):
+        while len(sentence) > limit:
+            if current:
+                yield current
+                current = ""
+            yield sentence[:limit]
+            sentence = sentence[limit:]
+        if current and len(current) + len(sentence) + 1 > limit:
+            yield current
+            current = ""
+        current = f"{current} {sentence}" if current else sentence
+    if current:
+        yield current
+
+def iter_chunks(pieces, chunk_tokens=CHUNK_TOKENS, overlap_tokens=CHUNK_OVERLAP_TOKENS):
+    """Yield overlapping chunks of at most `chunk_tokens` from text pieces.
+
+    Chunks end on paragraph breaks. Once a chunk is half full, it ends after
+    any paragraph whose checksum hits CHUNK_BOUNDARY_DIVISOR, so boundaries
+    depend on the content rather than on position. An edit therefore only
+    changes the chunks around it, and the rest still hit the summary cache.
+    Every chunk after the first starts with the last `overlap_tokens` of the
+    one before, so nothing is lost at the seams. Chunks are yielded as soon
+    as enough text has arrived.
+    """
+    overlap = overlap_tokens * CHARS_PER_TOKEN
+    limit = chunk_tokens * CHARS_PER_TOKEN - overlap
+    current = []
+    size = 0
+    carry = ""
+    for paragraph in iter_paragraphs(pieces, limit):
+        for part in split_long_paragraph(paragraph, limit):
+            if current and size + len(part) > limit:
+                body = "\n\n".join(current)
+                yield carry + body
+                carry = overlap_tail(body, overlap)
+                current, size = [], 0
+            current.append(part)
+            size += len(part) + 2
+            if size >= limit // 2 and zlib.crc32(part.encode("utf-8")) % CHUNK_BOUNDARY_DIVISOR == 0:
+                body = "\n\n".join(current)
+                yield carry + body
+                carry = overlap_tail(body, overlap)
+                current, size = [], 0
+    if current:
+        yield carry + "\n\n".join(current)
+
+def overlap_tail(text, overlap):
+    """The last `overlap` characters of text, starting on a word boundary"""
+    if overlap <= 0:
+        return ""
+    tail = text[-overlap:]
+    space = tail.find(" ")
+    if 0 <= space < len(tail) - 1 and len(text) > overlap:
+        tail = tail[space + 1:]
+    return f"[...] {tail}\n\n"
+
+class SummaryCache:
+    """Summaries stored on disk under a hash of the model, prompt template and input.
+
+    Whole documents, single chunks and merge steps are all cached this way,
+    so repeating a summary or re-running one after a small edit only calls
+    Gemini for the inputs that actually changed. Entries are written
+    atomically, so parallel workers never see half-written files.
+    """
+    def __init__(self, directory=SUMMARY_CACHE_DIR, model_name=MODEL_NAME):
+        self.directory = directory
+        self.model_name = model_name
+
+    def path(self, template, text):
+        digest = hashlib.sha256("\x00".join((self.model_name, template, text)).encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, digest[:2], digest + ".txt")
+
+    def get(self, template, text):
+        try:
+            with open(self.path(template, text), "r", encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, template, text, summary):
+        path = self.path(template, text)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(summary)
+        os.replace(tmp_path, path)
+
+class Summarizer:
+    """Map-reduce summarization for texts of any length.
+
+    The text is cut into overlapping chunks that are summarized concurrently
+    by a bounded worker pool (map). The partial summaries are then merged in
+    groups of REDUCE_FAN_IN, level by level, until one summary is left
+    (reduce). Text that fits in one chunk is summarized with a single request.
+    Every request goes through `cache` first when one is given.
+    `on_progress(stage, done, total)` is called from worker threads, and so is
+    `on_text(piece)`, which receives the final summary as it is generated.
+    """
+    def __init__(self, model, max_workers=MAX_WORKERS, on_progress=None, cache=None):
+        self.model = model
+        self.max_workers = max_workers
+        self.on_progress = on_progress
+        self.cache = cache
+        self.lock = threading.Lock()
+
+    def generate(self, template, text, on_text=None):
+        if self.cache is not None:
+            summary = self.cache.get(template, text)
+            if summary is not None:
+                if on_text is not None:
+                    on_text(summary)
+                return summary
+        prompt = template.format(text=text)
+        if on_text is None:
+            summary = self.model.generate_content(prompt).text
+        else:
+            parts = []
+            for chunk in self.model.generate_content(prompt, stream=True):
+                parts.append(chunk.text)
+                on_text(chunk.text)
+            summary = "".join(parts)
+        if self.cache is not None:
+            self.cache.put(template, text, summary)
+        return summary
+
+    def summarize(self, pieces, on_text=None):
+        """Summarize a string or an iterable of text pieces (e.g. pages).
+
+        Only the request that produces the final summary is streamed to
+        `on_text`; section summaries aren't shown.
+        """
+        if isinstance(pieces, str):
+            pieces = [pieces]
+        chunks = iter_chunks(pieces)
+        first = next(chunks, None)
+        if first is None:
+            return ""
+        second = next(chunks, None)
+        if second is None:
+            self.report("map", 0, 1)
+            return self.generate(SUMMARY_PROMPT, first, on_text)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            partials = self.run_stage(pool, "map", CHUNK_PROMPT, [first, second], chunks)
+            while True:
+                groups = [partials[i:i + REDUCE_FAN_IN] for i in range(0, len(partials), REDUCE_FAN_IN)]
+                texts = ["\n\n---\n\n".join(group) for group in groups]
+                if len(texts) == 1:
+                    self.report("reduce", 0, 1)
+                    return self.generate(REDUCE_PROMPT, texts[0], on_text)
+                partials = self.run_stage(pool, "reduce", REDUCE_PROMPT, texts)
+
+    def run_stage(self, pool, stage, template, texts, more=()):
+        """Submit each text as soon as it is available; results come back in order.
+
+        At most 2 * max_workers texts are submitted but unfinished at a time,
+        so a long document isn't read into the pool's queue faster than the
+        model gets through it.
+        """
+        futures = []
+        done = [0]
+        in_flight = threading.Semaphore(2 * self.max_workers)
+
+        def finished(_):
+            in_flight.release()
+            with self.lock:
+                done[0] += 1
+                self.report(stage, done[0], len(futures))
+
+        for text in itertools.chain(texts, more):
+            in_flight.acquire()
+            future = pool.submit(self.generate, template, text)
+            futures.append(future)
+            future.add_done_callback(finished)
+        return [future.result() for future in futures]
+
+    def report(self, stage, done, total):
+        if self.on_progress is not None:
+            self.on_progress(stage, done, total)
+
+# --- Offline Summarization ---
+SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+")
+LIST_MARKER = re.compile(r"^(?:[-*+•▪‣–]|\d+[.)])\s+")  # e.g. "- ", "• ", "1. ", "2) "
+WORD = re.compile(r"[a-z0-9']+")
+
+def iter_sentences(pieces):
+    """Yield sentences from text pieces; every line break also ends a sentence.
+
+    Notes are often one item per line, so lines are never joined. Sentences
+    split across piece boundaries are joined back together.
+    """
+    if isinstance(pieces, str):
+        pieces = [pieces]
+    carry = ""
+    for piece in pieces:
+        lines = (carry + piece).split("\n")
+        carry = lines.pop()  # May continue in the next piece
+        if len(carry) > OFFLINE_MAX_SENTENCE_CHARS:
+            # No line break in sight: hand over all but the last word
+            cut = carry.rfind(" ")
+            if cut > 0:
+                lines.append(carry[:cut])
+                carry = carry[cut + 1:]
+        for line in lines:
+            yield from line_sentences(line)
+    yield from line_sentences(carry)
+
+def line_sentences(line):
+    """Sentences of one line without its list marker, cut to OFFLINE_MAX_SENTENCE_CHARS"""
+    line = LIST_MARKER.sub("", line.strip())
+    for sentence in SENTENCE_BREAK.split(line):
+        sentence = " ".join(sentence.split())
+        start = 0
+        while len(sentence) - start > OFFLINE_MAX_SENTENCE_CHARS:
+            cut = sentence.rfind(" ", start, start + OFFLINE_MAX_SENTENCE_CHARS + 1)
+            if cut <= start:
+                cut = start + OFFLINE_MAX_SENTENCE_CHARS
+            yield sentence[start:cut]
+            start = cut + 1 if sentence[cut:cut + 1] == " " else cut
+        if start < len(sentence):
+            yield sentence[start:]
+
+def sentence_terms(sentence):
+    return [word for word in WORD.findall(sentence.lower()) if len(word) > 2 and word not in STOPWORDS]
+
+class ExtractiveSummarizer:
+    """Offline summaries made of the most central sentences of the text (TextRank).
+
+    Sentences become TF-IDF vectors, and a sentence's score is its PageRank
+    in the graph of cosine similarities between them. The text is ranked in
+    blocks of TEXTRANK_BLOCK sentences as it streams in, each block with its
+    own IDF, so the similarity matrices stay small, the cost grows linearly
+    with the text, and only one block plus the best candidates so far are
+    ever held in memory. Scores are scaled by block size so that sentences
+    from different blocks compare fairly.
+    Has the same `summarize` interface as Summarizer.
+    """
+    def __init__(self, ratio=OFFLINE_SUMMARY_RATIO, min_sentences=OFFLINE_MIN_SENTENCES,
+                 max_sentences=OFFLINE_MAX_SENTENCES):
+        self.ratio = ratio
+        self.min_sentences = min_sentences
+        self.max_sentences = max_sentences
+
+    def summarize(self, pieces, on_text=None):
+        total = 0
+        best = []  # Min-heap of (score, -index, sentence): the max_sentences best so far
+        for offset, sentences, scores in self.rank(pieces):
+            total += len(sentences)
+            for i, score in enumerate(scores):
+                entry = (score, -(offset + i), sentences[i])
+                if len(best) < self.max_sentences:
+                    heapq.heappush(best, entry)
+                else:
+                    heapq.heappushpop(best, entry)
+        count = min(self.max_sentences, max(self.min_sentences, round(total * self.ratio)))
+        keep = sorted(heapq.nlargest(count, best), key=lambda entry: -entry[1])
+        summary = "\n".join(f"- {sentence}" for _, _, sentence in keep)
+        if on_text is not None:
+            on_text(summary)
+        return summary
+
+    def condense(self, pieces, max_tokens=CHUNK_TOKENS):
+        """The highest ranked sentences, in their original order, that fit in max_tokens"""
+        budget = max_tokens * CHARS_PER_TOKEN
+        best = []  # Min-heap of (score, -index, sentence) that fits the budget
+        used = 0
+        cutoff = None  # Best entry pushed out so far; nothing ranked below it is kept
+        for offset, sentences, scores in self.rank(pieces):
+            for i, score in enumerate(scores):
+                entry = (score, -(offset + i), sentences[i])
+                if cutoff is not None and entry < cutoff:
+                    continue
+                heapq.heappush(best, entry)
+                used += len(sentences[i]) + 1
+                while used > budget:
+                    dropped = heapq.heappop(best)
+                    used -= len(dropped[2]) + 1
+                    cutoff = dropped if cutoff is None else max(cutoff, dropped)
+        return " ".join(sentence for _, _, sentence in sorted(best, key=lambda entry: -entry[1]))
+
+    def rank(self, pieces):
+        """Yield (offset, sentences, scores) for each block of sentences as the text arrives"""
+        offset = 0
+        block = []
+        for sentence in iter_sentences(pieces):
+            block.append(sentence)
+            if len(block) == TEXTRANK_BLOCK:
+                yield offset, block, self.score_block(block)
+                offset += len(block)
+                block = []
+        if block:
+            yield offset, block, self.score_block(block)
+
+    def score_block(self, sentences):
+        """TextRank score of each sentence in a block, scaled by the block size"""
+        count = len(sentences)
+
+        # Every term occurrence as (sentence, term id), in sentence order
+        term_ids = {}
+        terms = [[term_ids.setdefault(term, len(term_ids)) for term in sentence_terms(sentence)]
+                 for sentence in sentences]
+        lengths = np.fromiter(map(len, terms), dtype=np.int64, count=count)
+        columns = np.fromiter(itertools.chain.from_iterable(terms), dtype=np.int64, count=int(lengths.sum()))
+        rows = np.repeat(np.arange(count), lengths)
+
+        pairs = np.sort(rows * len(term_ids) + columns)
+        pairs = pairs[np.diff(pairs, prepend=-1) != 0]  # Count a term once per sentence
+        document_frequency = np.bincount(pairs % max(len(term_ids), 1), minlength=len(term_ids))
+        idf = np.log(count / np.maximum(document_frequency, 1)) + 1.0
+        return textrank(rows, columns, idf, count) * count
+
+def textrank(rows, columns, weights, count):
+    """PageRank of each sentence in the cosine similarity graph of its TF-IDF vectors.
+
+    `rows` and `columns` give the sentence and term of each term occurrence,
+    `weights` the IDF of each term.
+    """
+    if not len(weights):
+        return np.full(count, 1.0 / count)
+
+    vectors = np.zeros((count, len(weights)), dtype=np.float32)
+    np.add.at(vectors, (rows, columns), 1.0)
+    vectors *= weights.astype(np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors /= np.where(norms > 0, norms, 1.0)
+
+    similarity = vectors @ vectors.T
+    np.fill_diagonal(similarity, 0.0)
+    totals = similarity.sum(axis=1, keepdims=True)
+    # Sentences similar to nothing link to everything, like dangling pages
+    transition = np.where(totals > 0, similarity / np.where(totals > 0, totals, 1.0), 1.0 / count)
+
+    ranks = np.full(count, 1.0 / count)
+    for _ in range(TEXTRANK_ITERATIONS):
+        updated = (1 - TEXTRANK_DAMPING) / count + TEXTRANK_DAMPING * (transition.T @ ranks)
+        if np.abs(updated - ranks).sum() < 1e-6:
+            return updated
+        ranks = updated
+    return ranks
+
+def summarize_with_mode(mode, model, pieces, on_progress=None, on_text=None, cache=None, max_workers=MAX_WORKERS):
+    """Summarize with Gemini, offline, or offline-condensed then Gemini ("Hybrid")"""
+    if mode == "Offline":
+        return ExtractiveSummarizer().summarize(pieces, on_text)
+    if mode == "Hybrid":
+        if on_progress is not None:
+            on_progress("condense", 0, 1)
+        # Small enough for a single Gemini request
+        pieces = ExtractiveSummarizer().condense(pieces, CHUNK_TOKENS - CHUNK_OVERLAP_TOKENS)
+    summarizer = Summarizer(model, max_workers=max_workers, on_progress=on_progress, cache=cache)
+    return summarizer.summarize(pieces, on_text)
+
+# --- Batch Mode ---
+class RateLimiter:
+    """Token bucket shared by all worker threads; `acquire` blocks until a request may start"""
+    def __init__(self, per_minute, burst=1):
+        self.rate = per_minute / 60.0
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+class RetryingModel:
+    """Wraps a Gemini model with the rate limit and a retry budget shared across requests.
+
+    Quota and server errors are retried with exponential backoff until the
+    budget runs out; after that they fail the file right away, so a broken
+    key or an exhausted quota doesn't stall the whole batch.
+    """
+    def __init__(self, model, limiter, retry_budget=BATCH_RETRY_BUDGET, backoff=BATCH_BACKOFF):
+        self.model = model
+        self.limiter = limiter
+        self.retries_left = retry_budget
+        self.backoff = backoff
+        self.lock = threading.Lock()
+
+    def take_retry(self):
+        with self.lock:
+            if self.retries_left <= 0:
+                return False
+            self.retries_left -= 1
+            return True
+
+    def generate_content(self, prompt, **kwargs):
+        delay = self.backoff
+        while True:
+            self.limiter.acquire()
+            try:
+                return self.model.generate_content(prompt, **kwargs)
+            except RETRYABLE_ERRORS:
+                if not self.take_retry():
+                    raise
+                time.sleep(delay)
+                delay *= 2
+
+def find_notes(input_dir, exclude=None):
+    """Paths of all .txt/.pdf files under input_dir, relative to it, in a stable order.
+
+    `exclude` is a directory left out of the walk, e.g. an output directory
+    inside input_dir whose summaries would otherwise be picked up as notes.
+    """
+    excluded = os.path.realpath(exclude) if exclude else None
+    notes = []
+    for root, dirs, files in os.walk(input_dir):
+        dirs[:] = sorted(d for d in dirs if os.path.realpath(os.path.join(root, d)) != excluded)
+        for name in sorted(files):
+            if name.lower().endswith(BATCH_EXTENSIONS):
+                notes.append(os.path.relpath(os.path.join(root, name), input_dir))
+    return notes
+
+def read_note(path):
+    """Text pieces of a note: pages for a PDF, the whole file for text"""
+    if path.lower().endswith(".pdf"):
+        return iter_pdf_pages(path)
+    if os.path.getsize(path) >= LARGE_FILE_BYTES:
+        return MappedText(path)
+    with open(path, "r", encoding="utf-8") as f:
+        return [f.read()]
+
+class BatchOutput:
+    """Where batch results go: one .txt per note in a directory, or lines in a JSONL file.
+
+    Either way a note counts as done once its summary is written, which is
+    what lets an interrupted run pick up where it stopped.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.jsonl = path.lower().endswith(".jsonl")
+        self.lock = threading.Lock()
+        self.done = set()
+        if self.jsonl:
+            if os.path.dirname(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            if os.path.exists(path):
+                with open(path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            record = json.loads(line)
+                        except ValueError:
+                            continue  # Last line of a run that was killed mid-write
+                        if "summary" in record:
+                            self.done.add(record["file"])
+            self.file = open(path, "a", encoding="utf-8")
+        else:
+            os.makedirs(path, exist_ok=True)
+
+    def summary_path(self, note):
+        # Keeps the extension so notes.txt and notes.pdf don't share a summary
+        return os.path.join(self.path, note + ".summary.txt")
+
+    def is_done(self, note):
+        if self.jsonl:
+            return note in self.done
+        return os.path.exists(self.summary_path(note))
+
+    def write(self, note, summary=None, error=None):
+        if self.jsonl:
+            record = {"file": note}
+            if error is None:
+                record["summary"] = summary
+            else:
+                record["error"] = error
+            with self.lock:
+                self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+                self.file.flush()
+            return
+        if error is not None:
+            return  # Nothing is written, so the note is retried next run
+        path = self.summary_path(note)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(summary)
+        os.replace(tmp_path, path)
+
+    def close(self):
+        if self.jsonl:
+            self.file.close()
+
+def run_batch(input_dir, output_path, api_key, concurrency=BATCH_CONCURRENCY,
+              requests_per_minute=BATCH_REQUESTS_PER_MINUTE, retry_budget=BATCH_RETRY_BUDGET, mode="Gemini"):
+    """Summarize every note under input_dir, skipping ones a previous run already finished.
+
+    Up to `concurrency` files are summarized at once. Each file's chunks are
+    summarized one after another, so `concurrency` also bounds the number of
+    requests in flight. Returns the number of files that failed.
+    """
+    model = None
+    if mode != "Offline":
+        model = RetryingModel(gemini_clients.model(api_key), RateLimiter(requests_per_minute), retry_budget)
+    cache = SummaryCache()
+    output = BatchOutput(output_path)
+    notes = find_notes(input_dir, exclude=None if output.jsonl else output_path)
+    pending = [note for note in notes if not output.is_done(note)]
+    print(f"{len(notes)} notes, {len(notes) - len(pending)} already done, {len(pending)} to summarize")
+
+    def summarize_note(note):
+        return summarize_with_mode(mode, model, read_note(os.path.join(input_dir, note)), cache=cache, max_workers=1)
+
+    failed = 0
+    started = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            futures = {pool.submit(summarize_note, note): note for note in pending}
+            for done, future in enumerate(as_completed(futures), start=1):
+                note = futures[future]
+                try:
+                    output.write(note, summary=future.result())
+                    print(f"[{done}/{len(pending)}] {note}")
+                except Exception as e:
+                    failed += 1
+                    output.write(note, error=str(e))
+                    print(f"[{done}/{len(pending)}] {note} failed: {e}", file=sys.stderr)
+    finally:
+        output.close()
+
+    elapsed = time.perf_counter() - started
+    print(f"Summarized {len(pending) - failed} notes in {elapsed:.1f}s, {failed} failed"
+          + (f", {model.retries_left} retries left" if model is not None else ""))
+    if model is not None:
+        print(gemini_clients.report())
+    return failed
+
 class NoteSummarizerApp(ctk.CTk):
     def __init__(self):
         super().__init__()
@@ -45,6 +935,18 @@ class NoteSummarizerApp(ctk.CTk):
         self.input_label = ctk.CTkLabel(self, text="Input Text (Paste or Load File):", anchor="w", font=ctk.CTkFont(weight="bold"))
         self.input_label.grid(row=2, column=0, padx=20, pady=(10, 0), sticky="w")
 
+        # Paging for large files, which are only previewed; hidden otherwise
+        self.preview_frame = ctk.CTkFrame(self, fg_color="transparent")
+        self.preview_frame.grid(row=2, column=0, padx=20, pady=(10, 0), sticky="e")
+        self.prev_btn = ctk.CTkButton(self.preview_frame, text="< Prev", width=70, command=lambda: self.show_preview_page(self.preview_page - 1))
+        self.prev_btn.pack(side="left", padx=5)
+        self.page_label = ctk.CTkLabel(self.preview_frame, text="", width=140)
+        self.page_label.pack(side="left", padx=5)
+        self.next_btn = ctk.CTkButton(self.preview_frame, text="Next >", width=70, command=lambda: self.show_preview_page(self.preview_page + 1))
+        self.next_btn.pack(side="left", padx=5)
+        self.preview_frame.grid_remove()
+        self.preview_page = 0
+
         self.input_textbox = ctk.CTkTextbox(self, width=800, height=150)
         self.input_textbox.grid(row=3, column=0, padx=20, pady=(5, 10), sticky="nsew")
 
@@ -60,6 +962,11 @@ class NoteSummarizerApp(ctk.CTk):
         self.summarize_btn = ctk.CTkButton(self.button_frame, text="Summarize", command=self.start_summarization_thread, fg_color="#2CC985", hover_color="#229966", width=160, height=40, font=ctk.CTkFont(size=14, weight="bold"))
         self.summarize_btn.pack(side="left", padx=15)
 
+        # Gemini, offline (no key needed) or both
+        self.mode_var = ctk.StringVar(value="Gemini")
+        self.mode_menu = ctk.CTkOptionMenu(self.button_frame, values=SUMMARY_MODES, variable=self.mode_var, width=120, height=40)
+        self.mode_menu.pack(side="left", padx=15)
+
         # Red Button
         self.clear_btn = ctk.CTkButton(self.button_frame, text="Clear", command=self.clear_text, fg_color="#D32F2F", hover_color="#B71C1C", width=120, height=40, font=ctk.CTkFont(size=14, weight="bold"))
         self.clear_btn.pack(side="left", padx=15)
@@ -75,44 +982,97 @@ class NoteSummarizerApp(ctk.CTk):
         self.copy_btn = ctk.CTkButton(self, text="Copy Summary", command=self.copy_summary)
         self.copy_btn.grid(row=7, column=0, padx=20, pady=20)
 
+        # Pages of a loaded PDF (used for summarizing unless the text was edited)
+        # or a memory-mapped large text file
+        self.source = None
+        self.summary_cache = SummaryCache()
+        # Events from the summarizing thread; only the Tk loop touches widgets
+        self.summary_events = queue.Queue()
+        self.streaming = False  # Whether streamed text has replaced the placeholder yet
+
     def load_file(self):
         file_path = filedialog.askopenfilename(filetypes=[("Text Files", "*.txt"), ("PDF Files", "*.pdf")])
         if not file_path:
             return
 
+        self.end_preview()
+        self.input_textbox.delete("0.0", "end")
+        if file_path.lower().endswith(".pdf"):
+            # Pages appear as they are extracted; summarizing can start right away
+            self.source = PageFeed()
+            threading.Thread(target=self.load_pdf, args=(file_path, self.source), daemon=True).start()
+            return
+
+        self.source = None
         try:
-            text_content = ""
-            if file_path.lower().endswith(".pdf"):
-                text_content = self.extract_text_from_pdf(file_path)
-            else:
-                with open(file_path, "r", encoding="utf-8") as f:
-                    text_content = f.read()
+            if os.path.getsize(file_path) >= LARGE_FILE_BYTES:
+                # Only one page at a time goes into the textbox; the summary reads the mapping
+                self.source = MappedText(file_path)
+                self.input_textbox.configure(state="disabled")
+                self.preview_frame.grid()
+                self.show_preview_page(0)
+                return
+
+            with open(file_path, "r", encoding="utf-8") as f:
+                text_content = f.read()
 
-            self.input_textbox.delete("0.0", "end")
             self.input_textbox.insert("0.0", text_content)
         except Exception as e:
             messagebox.showerror("Error", f"Failed to load file: {e}")
 
-    def extract_text_from_pdf(self, file_path):
-        text = ""
+    def load_pdf(self, file_path, feed):
+        error = None
         try:
-            reader = PdfReader(file_path)
-            for page in reader.pages:
-                text += page.extract_text() + "\n"
+            for page_text in iter_pdf_pages(file_path):
+                if feed is not self.source:
+                    break  # Cleared or replaced by another file
+                feed.add(page_text)
+                self.after(0, self.show_loaded_page, feed, page_text)
         except Exception as e:
-            # Re-raise the exception to be caught in load_file
-            raise Exception(f"Error reading PDF: {e}")
-        return text
+            error = Exception(f"Error reading PDF: {e}")
+            self.after(0, lambda: messagebox.showerror("Error", f"Failed to load file: {error}"))
+        finally:
+            feed.finish(error)
 
-    def start_summarization_thread(self):
-        # Run in a separate thread to keep UI responsive
-        threading.Thread(target=self.summarize_text, daemon=True).start()
+    def show_loaded_page(self, feed, page_text):
+        if feed is not self.source:
+            return
+        self.input_textbox.insert("end", page_text)
+        self.input_textbox.edit_modified(False)  # Only user edits should count
 
-    def summarize_text(self):
+    def show_preview_page(self, index):
+        if not isinstance(self.source, MappedText):
+            return
+        self.preview_page = min(max(index, 0), self.source.page_count - 1)
+        self.input_textbox.configure(state="normal")
+        self.input_textbox.delete("0.0", "end")
+        self.input_textbox.insert("0.0", self.source.page(self.preview_page))
+        self.input_textbox.configure(state="disabled")
+        self.page_label.configure(text=f"Page {self.preview_page + 1}/{self.source.page_count} "
+                                       f"({self.source.size / 1024 / 1024:.1f} MB)")
+        self.prev_btn.configure(state="normal" if self.preview_page > 0 else "disabled")
+        self.next_btn.configure(state="normal" if self.preview_page < self.source.page_count - 1 else "disabled")
+
+    def end_preview(self):
+        """Leave large-file mode: hide the paging controls and make the input editable again"""
+        self.preview_frame.grid_remove()
+        self.input_textbox.configure(state="normal")
+
+    def summary_input(self):
+        """The loaded pages if the textbox still shows them unedited, otherwise the textbox text"""
+        if isinstance(self.source, MappedText):
+            return self.source  # The textbox only holds a preview page
+        if self.source is not None and not self.input_textbox.edit_modified():
+            return self.source
+        return self.input_textbox.get("0.0", "end").strip()
+
+    def start_summarization_thread(self):
+        # Inputs are read and checked here, on the Tk thread
         api_key = self.api_key_entry.get().strip()
-        text = self.input_textbox.get("0.0", "end").strip()
+        text = self.summary_input()
+        mode = self.mode_var.get()
 
-        if not api_key or api_key == "YOUR_API_KEY_HERE":
+        if mode != "Offline" and (not api_key or api_key == "YOUR_API_KEY_HERE"):
             messagebox.showwarning("Missing API Key", "Please enter your Google Gemini API Key.")
             return
 
@@ -125,38 +1085,86 @@ class NoteSummarizerApp(ctk.CTk):
         self.output_textbox.delete("0.0", "end")
         self.output_textbox.insert("0.0", "Generating summary...")
         self.output_textbox.configure(state="disabled")
+        self.streaming = False
+
+        # Run in a separate thread to keep UI responsive
+        threading.Thread(target=self.summarize_text, args=(api_key, text, mode, self.summary_events), daemon=True).start()
+        self.after(STREAM_REFRESH_MS, self.flush_summary_events, self.summary_events)
 
+    def summarize_text(self, api_key, text, mode, events):
+        """Runs on a worker thread; reports back only through `events`"""
         try:
-            # Configure the API key
-            genai.configure(api_key=api_key)
+            model = None
+            if mode != "Offline":
+                # Configured once per API key and reused across clicks
+                model = gemini_clients.model(api_key)
+
+            # Long texts are split into chunks, summarized in parallel and merged;
+            # the final summary is streamed as it is generated
+            summary = summarize_with_mode(mode, model, text,
+                                          on_progress=lambda *progress: events.put(("progress", progress)),
+                                          on_text=lambda piece: events.put(("text", piece)),
+                                          cache=self.summary_cache)
+            events.put(("done", summary))
 
-            # --- FIX APPLIED HERE ---
-            # Corrected the model name from 'genai.generate_text' to 'gemini-2.5-flash'
-            model = genai.GenerativeModel('gemini-2.5-flash')
+        except Exception as e:
+            events.put(("error", e))
 
-            prompt = f"Please provide a concise and structured summary of the following text:\n\n{text}"
-            
-            # Use generate_content to get the response
-            response = model.generate_content(prompt)
-            
-            summary = response.text
+    def flush_summary_events(self, events):
+        """Apply everything the worker reported since the last tick, then reschedule"""
+        text = []
+        while True:
+            try:
+                kind, value = events.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "text":
+                text.append(value)
+            elif kind == "progress":
+                self.report_progress(*value)
+            else:
+                self.append_summary_text("".join(text))
+                self.finish_summary(kind, value)
+                return
+        self.append_summary_text("".join(text))
+        self.after(STREAM_REFRESH_MS, self.flush_summary_events, events)
 
-            self.output_textbox.configure(state="normal")
-            self.output_textbox.delete("0.0", "end")
-            self.output_textbox.insert("0.0", summary)
-            self.output_textbox.configure(state="disabled")
+    def append_summary_text(self, text):
+        if not text:
+            return
+        self.output_textbox.configure(state="normal")
+        if not self.streaming:
+            self.output_textbox.delete("0.0", "end")  # Drop the "Generating summary..." placeholder
+            self.streaming = True
+        self.output_textbox.insert("end", text)
+        self.output_textbox.see("end")
+        self.output_textbox.configure(state="disabled")
 
-        except Exception as e:
-            self.output_textbox.configure(state="normal")
-            self.output_textbox.delete("0.0", "end")
-            self.output_textbox.insert("0.0", f"Error: {str(e)}")
-            self.output_textbox.configure(state="disabled")
-            messagebox.showerror("API Error", f"An error occurred: {e}. Check if your API key is correct and valid.")
-        
-        finally:
-            self.summarize_btn.configure(state="normal", text="Summarize")
+    def finish_summary(self, kind, value):
+        self.output_textbox.configure(state="normal")
+        self.output_textbox.delete("0.0", "end")
+        if kind == "done":
+            self.output_textbox.insert("0.0", value)
+        else:
+            self.output_textbox.insert("0.0", f"Error: {str(value)}")
+        self.output_textbox.configure(state="disabled")
+        self.summarize_btn.configure(state="normal", text="Summarize")
+        self.output_label.configure(text="Summary:")
+        if kind == "error":
+            messagebox.showerror("API Error", f"An error occurred: {value}. Check if your API key is correct and valid.")
+
+    def report_progress(self, stage, done, total):
+        if stage == "condense":
+            text = "Summary: condensing offline..."
+        elif stage == "map":
+            text = f"Summary: summarizing section {done}/{total}..." if total > 1 else "Summary: summarizing..."
+        else:
+            text = f"Summary: merging partial summaries {done}/{total}..." if total > 1 else "Summary: merging..."
+        self.output_label.configure(text=text)
 
     def clear_text(self):
+        self.source = None
+        self.end_preview()
         self.input_textbox.delete("0.0", "end")
         self.output_textbox.configure(state="normal")
         self.output_textbox.delete("0.0", "end")
@@ -171,5 +1179,30 @@ class NoteSummarizerApp(ctk.CTk):
             messagebox.showwarning("Empty", "No summary to copy.")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="AI Note Summarizer")
+    parser.add_argument("--bench-pdf", metavar="PDF", help="Time serial vs parallel text extraction and exit")
+    parser.add_argument("--batch", metavar="DIR", help="Summarize every .txt/.pdf file under DIR without the UI")
+    parser.add_argument("--output", default="summaries",
+                        help="Directory for batch summaries, or a .jsonl file (default: summaries)")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY, help="Files summarized at once")
+    parser.add_argument("--rate", type=float, default=BATCH_REQUESTS_PER_MINUTE, help="Gemini requests per minute")
+    parser.add_argument("--retries", type=int, default=BATCH_RETRY_BUDGET, help="Retries allowed for the whole batch")
+    parser.add_argument("--mode", choices=[mode.lower() for mode in SUMMARY_MODES], default="gemini",
+                        help="Summarize with Gemini, offline, or offline-condensed then Gemini (hybrid)")
+    parser.add_argument("--api-key", default=os.environ.get("GEMINI_API_KEY"),
+                        help="Gemini API key (default: $GEMINI_API_KEY)")
+    args = parser.parse_args()
+
+    if args.bench_pdf:
+        benchmark_pdf(args.bench_pdf)
+        sys.exit()
+
+    if args.batch:
+        mode = args.mode.capitalize()
+        if not args.api_key and mode != "Offline":
+            parser.error("--batch needs --api-key or GEMINI_API_KEY unless --mode is offline")
+        failed = run_batch(args.batch, args.output, args.api_key, args.concurrency, args.rate, args.retries, mode)
+        sys.exit(1 if failed else 0)
+
     app = NoteSummarizerApp()
     app.mainloop()
\ No newline at end of file
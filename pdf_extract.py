@@ -0,0 +1,11 @@
+"""PDF page extraction run in note_summarizer's worker processes.
+
+Kept apart from note_summarizer so that spawned workers only import pypdf,
+not the GUI and Gemini libraries.
+"""
+from pypdf import PdfReader
+
+def extract_page_range(file_path, start, stop):
+    """Text of pages [start, stop)"""
+    reader = PdfReader(file_path)
+    return [(reader.pages[i].extract_text() or "") + "\n" for i in range(start, stop)]